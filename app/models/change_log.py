@@ -0,0 +1,126 @@
+from data.crud import CrudOperations
+from utils.utils import error_reporter
+
+# Default bound on the number of changes kept (compact-changes --keep, --change-log-rows)
+DEFAULT_MAX_ROWS = 100000
+
+# Columns of `contacts` tracked by the update trigger
+TRACKED_COLUMNS = ['first_name', 'last_name', 'phone', 'email', 'address', 'created_at', 'updated_at']
+
+
+class ChangeLog(CrudOperations):
+    """
+    Change-data-capture log for the contacts table.
+
+    Triggers on `contacts` append one row per insert, update or delete to `contacts_changes`, numbered by a
+    monotonically increasing `seq`. Downstream mirrors remember the last `seq` they applied and only read
+    what came after it, so syncing costs in proportion to the number of changes, not the table size.
+    """
+
+    def __init__(self, db_name='phonebook.db'):
+        super().__init__('contacts_changes', db_name)
+        self.create_change_log()
+
+    @error_reporter
+    def create_change_log(self):
+        """
+        Create the change log table and the triggers that maintain it, if they do not exist.
+        """
+        changed_columns = ' || '.join(
+            f"CASE WHEN OLD.{column} IS NOT NEW.{column} THEN '{column},' ELSE '' END" for column in TRACKED_COLUMNS
+        )
+        queries = [
+            '''
+            CREATE TABLE IF NOT EXISTS contacts_changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                op TEXT NOT NULL,
+                contact_id INTEGER NOT NULL,
+                changed_columns TEXT,
+                changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            ''',
+            f'''
+            CREATE TRIGGER IF NOT EXISTS contacts_changes_insert AFTER INSERT ON contacts
+            BEGIN
+                INSERT INTO contacts_changes (op, contact_id, changed_columns)
+                VALUES ('insert', NEW.id, '{','.join(TRACKED_COLUMNS)}');
+            END;
+            ''',
+            f'''
+            CREATE TRIGGER IF NOT EXISTS contacts_changes_update AFTER UPDATE ON contacts
+            BEGIN
+                INSERT INTO contacts_changes (op, contact_id, changed_columns)
+                VALUES ('update', NEW.id, rtrim({changed_columns}, ','));
+            END;
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS contacts_changes_delete AFTER DELETE ON contacts
+            BEGIN
+                INSERT INTO contacts_changes (op, contact_id, changed_columns)
+                VALUES ('delete', OLD.id, NULL);
+            END;
+            ''',
+        ]
+        for query in queries:
+            self.execute(query)
+        self.commit()
+
+    def latest_seq(self):
+        """Return the sequence number of the newest change, or 0 when nothing was logged yet."""
+        rsp = self.fetchone(f"SELECT MAX(seq) as seq FROM {self.table}")
+        return rsp['seq'] or 0
+
+    def oldest_seq(self):
+        """Return the sequence number of the oldest change still kept in the log, or None when it is empty."""
+        rsp = self.fetchone(f"SELECT MIN(seq) as seq FROM {self.table}")
+        return rsp['seq']
+
+    def changes_since(self, seq, batch_size=500):
+        """
+        Yield batches (lists of dictionaries) of the changes with a sequence number greater than `seq`, oldest first.
+        Raises ValueError if changes after `seq` were already compacted away, also when `compact()` runs between
+        two batches; the caller must then resync fully.
+        """
+        query = f"SELECT * FROM {self.table} WHERE seq > ? ORDER BY seq LIMIT ?"
+        while True:
+            batch = self.fetchall(query, (seq, batch_size))
+            if not batch:
+                oldest = self.oldest_seq()
+                if oldest is not None and seq < oldest - 1:
+                    self._compacted(seq, oldest)
+                return
+            # Sequence numbers are consecutive (AUTOINCREMENT, rolled back with their transaction): a gap in
+            # front of the batch means compact() deleted changes this reader has not seen yet
+            if batch[0]['seq'] > seq + 1:
+                self._compacted(seq, batch[0]['seq'])
+            yield batch
+            seq = batch[-1]['seq']
+
+    @staticmethod
+    def _compacted(seq, oldest):
+        raise ValueError(f"Changes after sequence {seq} were compacted (oldest kept is {oldest}); "
+                         f"a full resync is required")
+
+    def size(self):
+        """Return the number of changes kept in the log; sequence numbers are consecutive, so nothing is scanned."""
+        rsp = self.fetchone(f"SELECT MAX(seq) - MIN(seq) + 1 as size FROM {self.table}")
+        return rsp['size'] or 0
+
+    @CrudOperations.transactional
+    def compact(self, max_rows=DEFAULT_MAX_ROWS):
+        """
+        Bound the size of the log by keeping only the newest `max_rows` changes.
+        The newest change is always kept so readers can still tell where the log stands.
+        Returns the number of deleted changes.
+        """
+        max_rows = max(max_rows, 1)
+        cursor = self.execute(
+            f"DELETE FROM {self.table} WHERE seq <= (SELECT MAX(seq) FROM {self.table}) - ?", (max_rows,)
+        )
+        return cursor.rowcount
+
+    def compact_if_needed(self, max_rows=DEFAULT_MAX_ROWS):
+        """Compact only when the log holds more than `max_rows` changes; cheap enough to call in every idle period."""
+        if self.size() <= max_rows:
+            return 0
+        return self.compact(max_rows)
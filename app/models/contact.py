@@ -1,10 +1,45 @@
+import os
+import re
+
+from app.models.change_log import ChangeLog
 from data.crud import CrudOperations
+from data.migrations import CONTACT_STATS_REBUILD, migrate
+from utils.bloom_filter import BloomFilter
+from utils.schema_parser import get_table_columns, get_table_schema
 from utils.utils import error_reporter  # Import the error reporter decorator
+from utils.validators import compile_validator, format_phone, strip_or_none, validate_fields
+
+NAME_MESSAGE = "Invalid {field}. It must only contain letters and cannot be empty."
+
+# Field rules shared by every write path (interactive, CSV import, API); compiled with the table schema
+CONTACT_RULES = {
+    'first_name': {'regex': r'^[^\W\d_]+$', 'normalizer': str.strip,
+                   'message': NAME_MESSAGE.format(field='first name')},
+    'last_name': {'regex': r'^[^\W\d_]+$', 'normalizer': str.strip,
+                  'message': NAME_MESSAGE.format(field='last name')},
+    'phone': {'regex': r'^\(\d{3}\)\d{3}-\d{4}$', 'normalizer': format_phone,
+              'message': "{value} is invalid phone number format. Please enter in (xxx)xxx-xxxx or xxxxxxxxxx format."},
+    'email': {'regex': r'^\S+@\S+\.\S+$', 'normalizer': strip_or_none,
+              'message': "{value} is invalid email format. Please enter a valid email."},
+    'address': {'normalizer': strip_or_none},
+}
+
+
+def phone_key(phone):
+    """Digits of a phone number, so (123)456-7890 and 1234567890 hit the same Bloom filter bits."""
+    return re.sub(r'\D', '', str(phone))
+
 
 class Contacts(CrudOperations):
-    def __init__(self):
-        super().__init__('contacts')  # Initialize the CrudOperations with the 'contacts' table
+    def __init__(self, db_name='phonebook.db'):
+        super().__init__('contacts', db_name)  # Initialize the CrudOperations with the 'contacts' table
         self.create_contacts_table()
+        migrate(self)  # Bring the indexes (and later schema changes) up to date
+        self.schema = get_table_schema(self, self.table)  # Refresh, the table may have just been created
+        self.validator = compile_validator(get_table_columns(self, self.table), CONTACT_RULES)
+        self.change_log = ChangeLog(db_name)  # Installs the change-data-capture triggers on `contacts`
+        self.change_log.close()  # Reconnects lazily when the log is read
+        self.phone_filter = None  # Optional Bloom filter over phone_key(phone), see enable_phone_filter
 
     @error_reporter
     def create_contacts_table(self):
@@ -23,6 +58,8 @@ class Contacts(CrudOperations):
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         );
         '''
+        # New files reclaim space incrementally; existing files are migrated with `main.py maintain --migrate`
+        self.execute("PRAGMA auto_vacuum = INCREMENTAL")
         self.execute(query)  # Use `execute` directly since `Contacts` inherits from `CrudOperations`
 
     @error_reporter
@@ -50,6 +87,7 @@ class Contacts(CrudOperations):
         """
         Count the total number of contacts in the table, optionally filtered by a search term.
         If a search term is provided, it counts the number of contacts matching the term by first name, last name, or phone.
+        The unfiltered total is read from the trigger-maintained `contacts_stats` table instead of scanning.
         """
         if search_term:
             where_clause = "first_name LIKE ? OR last_name LIKE ? OR phone LIKE ?"
@@ -58,18 +96,155 @@ class Contacts(CrudOperations):
             rsp = self.fetchone(query, (search_value, search_value, search_value))
             return rsp['count'] if rsp else 0
         else:
-            query = f"SELECT COUNT(*) as count FROM {self.table}"
-            rsp = self.fetchone(query)
-            return rsp['count'] if rsp else 0
+            rsp = self.fetchone("SELECT value FROM contacts_stats WHERE key = 'total'")
+            return rsp['value'] if rsp else 0
 
+    @error_reporter
+    def contact_stats(self):
+        """
+        Return the trigger-maintained counters: {'total', 'with_email', 'area_codes': {area_code: count}}.
+        Phones that are not in (xxx)xxx-xxxx format are counted under the area code 'other'.
+        """
+        stats = {'total': 0, 'with_email': 0, 'area_codes': {}}
+        for row in self.fetchall("SELECT key, value FROM contacts_stats"):
+            if row['key'].startswith('area:'):
+                stats['area_codes'][row['key'][len('area:'):]] = row['value']
+            else:
+                stats[row['key']] = row['value']
+        return stats
+
+    @CrudOperations.transactional
+    def rebuild_stats(self):
+        """
+        Recompute `contacts_stats` from the contacts table, e.g. after writes that bypassed the triggers.
+        Returns the drift that was corrected as {key: (old_value, new_value)}.
+        """
+        before = {row['key']: row['value'] for row in self.fetchall("SELECT key, value FROM contacts_stats")}
+        for statement in CONTACT_STATS_REBUILD:
+            self.execute(statement)
+        after = {row['key']: row['value'] for row in self.fetchall("SELECT key, value FROM contacts_stats")}
+        return {key: (before.get(key, 0), after.get(key, 0))
+                for key in sorted(set(before) | set(after)) if before.get(key, 0) != after.get(key, 0)}
 
     @error_reporter
     def find_by_phone(self, phone):
         """
         Find a contact by phone number.
+        With the phone filter enabled, numbers the filter has never seen are answered without a query.
         """
+        if self.phone_filter is not None:
+            self._sync_phone_filter()
+            self.filter_counters['checks'] += 1
+            if phone_key(phone) not in self.phone_filter:
+                self.filter_counters['definite_misses'] += 1
+                return None
         query = f"SELECT * FROM {self.table} WHERE phone = ?"
-        return self.fetchone(query, (phone,))  # Use `fetchone` to return a single record if found
+        contact = self.fetchone(query, (phone,))  # Use `fetchone` to return a single record if found
+        if contact is None and self.phone_filter is not None:
+            self.filter_counters['false_positives'] += 1
+        return contact
+
+    def add(self, **fields):
+        result = super().add(**fields)
+        self._remember_phones([fields.get('phone')])
+        return result
+
+    def bulk_add(self, records, partial=False):
+        result = super().bulk_add(records, partial=partial)
+        self._remember_phones(record.get('phone') for record in records)  # Rejected rows only cost false positives
+        return result
+
+    def update(self, where, **fields):
+        result = super().update(where, **fields)
+        self._remember_phones([fields.get('phone')])
+        return result
+
+    def delete(self, **where):
+        result = super().delete(**where)
+        if self.phone_filter is not None:
+            self.filter_counters['deletes'] += 1  # Bloom filters cannot forget: deleted numbers stay "maybe"
+        return result
+
+    def enable_phone_filter(self, error_rate=0.001, capacity=None, path=None):
+        """
+        Keep a Bloom filter of every phone number so `find_by_phone` can skip the query for unknown numbers.
+        The filter is loaded from the sidecar file `path` (default: <db_name>.bloom) when it was saved at the
+        current change-log sequence and contact count, otherwise it is built from the table and saved.
+        Writes by this instance update it directly; writes by other connections are picked up from the change log.
+        """
+        self.phone_filter_path = path or self.db_name + '.bloom'
+        self.filter_counters = {'checks': 0, 'definite_misses': 0, 'false_positives': 0, 'deletes': 0}
+        self._filter_version = None
+        if os.path.exists(self.phone_filter_path):
+            try:
+                bloom, header = BloomFilter.load(self.phone_filter_path)
+            except (OSError, ValueError, KeyError):
+                bloom, header = None, {}
+            fresh = (header.get('seq'), header.get('total')) == (self.change_log.latest_seq(), self.count_contacts())
+            if bloom and fresh and bloom.error_rate == error_rate and (capacity is None or bloom.capacity == capacity):
+                self.phone_filter = bloom
+                self._filter_seq = header['seq']
+                return False
+        self.rebuild_phone_filter(error_rate, capacity)
+        self.save_phone_filter()
+        return True
+
+    def rebuild_phone_filter(self, error_rate=None, capacity=None):
+        """Build the phone filter from the table; the capacity defaults to twice the current contact count."""
+        self._filter_seq = self.change_log.latest_seq()
+        phones = [row['phone'] for row in self.fetchall(f"SELECT phone FROM {self.table}")]
+        if error_rate is None:
+            error_rate = self.phone_filter.error_rate
+        bloom = BloomFilter(capacity or max(2 * len(phones), 10000), error_rate)
+        for phone in phones:
+            bloom.add(phone_key(phone))
+        self.phone_filter = bloom
+        self.filter_counters['deletes'] = 0
+
+    def save_phone_filter(self):
+        """Write the phone filter to its sidecar file, stamped with the change-log sequence it is complete up to."""
+        self._sync_phone_filter()
+        self.phone_filter.save(self.phone_filter_path, seq=self._filter_seq, total=self.count_contacts())
+
+    def _remember_phones(self, phones):
+        if self.phone_filter is None:
+            return
+        for phone in phones:
+            if phone:
+                self.phone_filter.add(phone_key(phone))
+        if self.phone_filter.count > self.phone_filter.capacity:
+            self.rebuild_phone_filter(capacity=2 * self.phone_filter.capacity)  # Over capacity: rate degrades
+
+    def _sync_phone_filter(self):
+        """
+        Add the numbers written by other connections or processes since the filter last caught up.
+        PRAGMA data_version only changes when another connection commits, so the usual cost is that one pragma.
+        """
+        self.connect()
+        version = (self.conn, self.conn.execute("PRAGMA data_version").fetchone()[0])
+        if version == self._filter_version:
+            return
+        self._filter_version = version
+        latest = self.change_log.latest_seq()
+        if latest == self._filter_seq:
+            return
+        try:
+            for batch in self.change_log.changes_since(self._filter_seq):
+                ids = [change['contact_id'] for change in batch
+                       if change['op'] == 'insert' or 'phone' in (change['changed_columns'] or '').split(',')]
+                if ids:
+                    placeholders = ', '.join('?' for _ in ids)
+                    rows = self.fetchall(f"SELECT phone FROM {self.table} WHERE id IN ({placeholders})", tuple(ids))
+                    self._remember_phones(row['phone'] for row in rows)
+                self.filter_counters['deletes'] += sum(change['op'] == 'delete' for change in batch)
+        except ValueError:
+            self.rebuild_phone_filter()  # The changes were compacted away
+            return
+        self._filter_seq = latest
+
+    def phone_filter_stats(self):
+        """Size, fill and error rate of the phone filter together with its hit counters."""
+        return dict(self.phone_filter.stats(), **self.filter_counters, sidecar=self.phone_filter_path)
 
     @error_reporter
     def update_contact_by_phone(self, phone, **fields):
@@ -79,4 +254,24 @@ class Contacts(CrudOperations):
     @error_reporter
     def update_contact_by_id(self, contact_id, **fields):
         """Update contact by contact ID."""
-        self.update({'id': contact_id}, **fields)
\ No newline at end of file
+        self.update({'id': contact_id}, **fields)
+
+    @CrudOperations.transactional
+    def merge_contacts(self, merges):
+        """
+        Merge duplicate contacts in a single transaction.
+        `merges` is a list of (survivor_id, duplicate_ids, fields): the survivor is updated with `fields`
+        and the duplicates are deleted. Returns the number of deleted duplicates.
+        """
+        deleted = 0
+        for survivor_id, duplicate_ids, fields in merges:
+            if fields:
+                validate_fields(fields, self.schema)
+                set_clause = ', '.join(f"{k} = ?" for k in fields)
+                self.execute(f"UPDATE {self.table} SET {set_clause}, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                             tuple(fields.values()) + (survivor_id,))
+            if duplicate_ids:
+                placeholders = ', '.join('?' for _ in duplicate_ids)
+                cursor = self.execute(f"DELETE FROM {self.table} WHERE id IN ({placeholders})", tuple(duplicate_ids))
+                deleted += cursor.rowcount
+        return deleted
@@ -0,0 +1,267 @@
+import itertools
+import os
+import sqlite3
+import threading
+import time
+
+from app.models.contact import Contacts
+from data.crud import CrudOperations
+
+WRITE_MODES = ('through', 'async')
+
+_memory_ids = itertools.count()
+
+# Contacts read from the file per query when changes are copied into the in-memory copy
+MIRROR_CHUNK = 500
+
+
+class _MemoryCopy(Contacts):
+    """
+    `Contacts` on the shared-cache copy, working on the single keeper connection for every thread.
+    Separate connections to a shared cache take table-level locks and fail with "database table is locked"
+    instead of waiting, so `InMemoryContacts` serializes all use of this object under its lock.
+    """
+
+    def __init__(self, db_name, keeper):
+        self.keeper = keeper
+        super().__init__(db_name)
+
+    @property
+    def conn(self):
+        return self.keeper
+
+    @conn.setter
+    def conn(self, value):
+        pass  # Always the keeper
+
+    def close_thread_connection(self):
+        pass  # The keeper stays open between transactions
+
+    def close(self):
+        pass  # Closed by InMemoryContacts.close
+
+    @CrudOperations.transactional
+    def mirror(self, ids, rows):
+        """Replace the contacts with the given `ids` by `rows`, the file's version of them with its ids."""
+        self.conn.executemany(f"DELETE FROM {self.table} WHERE id = ?", [(contact_id,) for contact_id in ids])
+        if rows:
+            columns = list(rows[0])
+            self.conn.executemany(
+                f"INSERT INTO {self.table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                [tuple(row[column] for column in columns) for row in rows],
+            )
+
+    def iter_all(self, columns=None, order_by=None, filters=None, batch_size=500, **where):
+        """Read the rows in one go: a stream left open on the keeper would run into the writes of other threads."""
+        query, params = self.query_builder().build(self._all_filters(filters, where), columns, order_by)
+        return iter(self.fetchall(query, params))
+
+
+class InMemoryContacts:
+    """
+    Drop-in replacement for `Contacts` that serves every read from an in-memory copy of the database.
+
+    At startup the file is copied into a shared-cache `:memory:` database with the backup API. One keeper
+    connection holds the copy open and serves every thread; reads and writes of the copy take turns under one
+    lock. Writes go:
+      'through' - to the file, then the rows the file's change log reports as changed are copied into the copy
+                  as the file stored them, ids included. Changes made to the file by other processes are copied
+                  the same way before every write (the whole file is loaded again if its log was compacted
+                  past the copy), so both hold the same rows and ids. A write is durable when it returns.
+      'async'   - to the copy only; a background thread writes the whole copy back to the file with the
+                  backup API every `flush_interval` seconds (and on close), from a snapshot that briefly
+                  doubles the memory used. Writes from the last interval are
+                  lost if the process dies, and the process must be the only writer of the file.
+    """
+
+    def __init__(self, db_name='phonebook.db', write_mode='through', flush_interval=5.0):
+        if write_mode not in WRITE_MODES:
+            raise ValueError(f"Unknown write mode: {write_mode}")
+        started = time.monotonic()
+        self.db_name = db_name  # The file on disk; maintenance and backups keep working on it
+        self.write_mode = write_mode
+        self.flush_interval = flush_interval
+        self.disk = Contacts(db_name)  # Creates and migrates the file before it is copied
+        self.disk.close()
+
+        self.memory_name = f"file:phonebook-memory-{os.getpid()}-{next(_memory_ids)}?mode=memory&cache=shared"
+        self.keeper = sqlite3.connect(self.memory_name, uri=True, check_same_thread=False)
+        self.keeper.row_factory = sqlite3.Row
+        self._load()
+        self.memory = _MemoryCopy(self.memory_name, self.keeper)
+        self.validator = self.memory.validator
+        self.table = self.memory.table
+        self.schema = self.memory.schema
+        self.load_seconds = time.monotonic() - started
+
+        self._lock = threading.Lock()  # Guards the keeper connection and `_dirty`
+        self._dirty = False
+        self._flush_lock = threading.Lock()
+        self.flushes = 0
+        self._stop = threading.Event()
+        self._flusher = None
+        if write_mode == 'async':
+            self._flusher = threading.Thread(target=self._flush_loop, name='memory-flush', daemon=True)
+            self._flusher.start()
+
+    def _load(self):
+        """Copy the whole file into the in-memory database, replacing what it held."""
+        # Read first: a change that races the copy is then copied again later, which is harmless
+        self._disk_seq = self.disk.change_log.latest_seq()
+        source = sqlite3.connect(self.db_name)
+        try:
+            source.backup(self.keeper)
+        finally:
+            source.close()
+
+    def _catch_up(self):
+        """Copy the contacts the file changed since the last call into the in-memory copy, with the file's ids."""
+        ids, seq = [], self._disk_seq
+        try:
+            for batch in self.disk.change_log.changes_since(self._disk_seq):
+                ids.extend(change['contact_id'] for change in batch)
+                seq = batch[-1]['seq']
+        except ValueError:
+            self._load()  # Compacted past the copy: the changed ids are unknown
+            return
+        ids = list(dict.fromkeys(ids))
+        if ids:
+            rows = []
+            for start in range(0, len(ids), MIRROR_CHUNK):
+                chunk = ids[start:start + MIRROR_CHUNK]
+                rows += self.disk.fetchall(f"SELECT * FROM {self.table} WHERE id IN ({', '.join('?' for _ in chunk)})",
+                                           chunk)
+            self.memory.mirror(ids, rows)
+        self._disk_seq = seq  # Only once the copy has them: a failed mirror is retried on the next write
+
+    def _read(self, method, *args, **kwargs):
+        with self._lock:
+            return getattr(self.memory, method)(*args, **kwargs)
+
+    def _write(self, method, *args, **kwargs):
+        with self._lock:
+            if self.write_mode == 'async':
+                self._dirty = True
+                return getattr(self.memory, method)(*args, **kwargs)
+            self._catch_up()  # Writes of other processes first, so the copy checks against the same rows
+            try:
+                return getattr(self.disk, method)(*args, **kwargs)
+            finally:
+                self._catch_up()
+
+    def add(self, **fields):
+        return self._write('add', **fields)
+
+    def bulk_add(self, records, partial=False):
+        return self._write('bulk_add', records, partial=partial)
+
+    def update(self, where, **fields):
+        return self._write('update', where, **fields)
+
+    def delete(self, **where):
+        return self._write('delete', **where)
+
+    def merge_contacts(self, merges):
+        return self._write('merge_contacts', merges)
+
+    def rebuild_stats(self):
+        drift = self._write('rebuild_stats')
+        if self.write_mode == 'through':
+            self._read('rebuild_stats')  # The copy has the counters it was loaded with, drift included
+        return drift
+
+    def update_contact_by_phone(self, phone, **fields):
+        return self.update({'phone': phone}, **fields)
+
+    def update_contact_by_id(self, contact_id, **fields):
+        return self.update({'id': contact_id}, **fields)
+
+    def fetch_one(self, **where):
+        return self._read('fetch_one', **where)
+
+    def fetch_all(self, limit=10, offset=0, columns=None, order_by=None, filters=None, **where):
+        return self._read('fetch_all', limit=limit, offset=offset, columns=columns, order_by=order_by,
+                          filters=filters, **where)
+
+    def iter_all(self, columns=None, order_by=None, filters=None, batch_size=500, **where):
+        return self._read('iter_all', columns=columns, order_by=order_by, filters=filters,
+                          batch_size=batch_size, **where)
+
+    def fetchall(self, query, params=None):
+        return self._read('fetchall', query, params)
+
+    def fetchone(self, query, params=None):
+        return self._read('fetchone', query, params)
+
+    def search_contact(self, search_term, limit=10, offset=0):
+        return self._read('search_contact', search_term, limit=limit, offset=offset)
+
+    def get_all_contacts(self, limit=10, offset=0):
+        return self._read('get_all_contacts', limit=limit, offset=offset)
+
+    def count_contacts(self, search_term=None):
+        return self._read('count_contacts', search_term)
+
+    def contact_stats(self):
+        return self._read('contact_stats')
+
+    def find_by_phone(self, phone):
+        return self._read('find_by_phone', phone)
+
+    def flush(self):
+        """
+        Write the in-memory copy back to the file if it changed since the last flush. Returns True if it did.
+        Only a memory-to-memory snapshot is taken under the lock; the slow write to the file runs outside it,
+        so lookups keep going meanwhile.
+        """
+        with self._flush_lock:  # One flush at a time, so an older snapshot never overwrites a newer one
+            with self._lock:
+                if not self._dirty:
+                    return False
+                snapshot = sqlite3.connect(':memory:')
+                self.keeper.backup(snapshot)
+                self._dirty = False
+            try:
+                target = sqlite3.connect(self.db_name, timeout=self.disk.busy_timeout)
+                try:
+                    snapshot.backup(target)  # Replaces the file's content in one transaction
+                finally:
+                    target.close()
+            except Exception:
+                self._dirty = True  # Try again next time
+                raise
+            finally:
+                snapshot.close()
+            self.flushes += 1
+            return True
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def memory_report(self):
+        """Size of the in-memory copy next to the file it was loaded from, and the time the load took."""
+        with self._lock:
+            page_size = self.keeper.execute("PRAGMA page_size").fetchone()[0]
+            page_count = self.keeper.execute("PRAGMA page_count").fetchone()[0]
+        return {
+            'memory_bytes': page_size * page_count,
+            'disk_bytes': os.path.getsize(self.db_name),
+            'page_size': page_size,
+            'page_count': page_count,
+            'load_seconds': self.load_seconds,
+            'write_mode': self.write_mode,
+            'flushes': self.flushes,
+        }
+
+    def close(self):
+        """Flush pending writes (async mode), stop the flush thread and release the in-memory copy."""
+        self._stop.set()
+        if self._flusher:
+            self._flusher.join()
+        if self.write_mode == 'async':
+            self.flush()
+        self.memory.change_log.close()
+        self.disk.close()
+        self.disk.change_log.close()
+        self.keeper.close()  # Last connection to the shared cache: the copy is freed
@@ -0,0 +1,266 @@
+import os
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from app.models.contact import Contacts
+
+
+class ShardedContacts:
+    """
+    Drop-in replacement for `Contacts` that partitions the contacts table across several SQLite files.
+
+    Every shard is a plain `Contacts` instance on its own file, pinned to its own single worker thread,
+    so one shard never waits on another shard's writer lock. Point operations (by phone or by id) are
+    routed to a single shard; searches, counts and listings are scattered to all shards and merged.
+
+    Contact ids are made global by interleaving: global_id = local_id * shards + shard_index.
+    """
+
+    def __init__(self, db_name='phonebook.db', shards=4, shard_by='hash'):
+        if shards < 1:
+            raise ValueError("The number of shards must be at least 1")
+        if shard_by not in ('hash', 'area_code'):
+            raise ValueError(f"Unknown sharding strategy: {shard_by}")
+        self.db_name = db_name
+        self.shard_count = shards
+        self.shard_by = shard_by
+        self.shard_paths = self._shard_paths(db_name, shards)
+
+        # One single-threaded executor per shard: sqlite3 connections must stay on the thread that made them
+        self.executors = [ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'shard-{i}') for i in range(shards)]
+        self.shards = [self._call(i, Contacts, path) for i, path in enumerate(self.shard_paths)]
+        self.validator = self.shards[0].validator  # Same schema everywhere; validators are stateless
+
+    @staticmethod
+    def _shard_paths(db_name, shards):
+        """Derive the shard file names from the base database name, e.g. phonebook_shard0.db."""
+        root, ext = os.path.splitext(db_name)
+        return [f"{root}_shard{i}{ext or '.db'}" for i in range(shards)]
+
+    @staticmethod
+    def normalize_phone(phone):
+        """Reduce a phone number to its digits so (123)456-7890 and 1234567890 route the same way."""
+        return re.sub(r'\D', '', str(phone))
+
+    def shard_for_phone(self, phone):
+        """Return the index of the shard that owns the given phone number."""
+        digits = self.normalize_phone(phone)
+        if self.shard_by == 'area_code' and len(digits) >= 3:
+            return int(digits[:3]) % self.shard_count
+        return zlib.crc32(digits.encode()) % self.shard_count
+
+    def _submit(self, index, func, *args, **kwargs):
+        return self.executors[index].submit(func, *args, **kwargs)
+
+    def _call(self, index, func, *args, **kwargs):
+        """Run `func` on the shard's own thread and wait for the result."""
+        return self._submit(index, func, *args, **kwargs).result()
+
+    def _scatter(self, method, *args, **kwargs):
+        """Run the same `Contacts` method on every shard in parallel and return the results in shard order."""
+        futures = [self._submit(i, getattr(shard, method), *args, **kwargs) for i, shard in enumerate(self.shards)]
+        return [future.result() for future in futures]
+
+    def _to_global(self, row, index):
+        if row is None:
+            return None
+        row = dict(row)
+        row['id'] = row['id'] * self.shard_count + index
+        return row
+
+    def _route(self, where):
+        """
+        Work out which shard a WHERE condition targets.
+        Returns (shard index or None when every shard must be asked, where clause with a shard-local id).
+        """
+        if 'id' in where:
+            global_id = int(where['id'])
+            local_where = dict(where, id=global_id // self.shard_count)
+            return global_id % self.shard_count, local_where
+        if 'phone' in where:
+            return self.shard_for_phone(where['phone']), where
+        return None, where
+
+    def _local_filters(self, filters):
+        """
+        Translate the global ids in `filters` (see `QueryBuilder`) into shard-local ones.
+        Returns one filter list per shard, or None for a shard that cannot hold a matching row.
+        """
+        per_shard = [[] for _ in self.shards]
+        for condition in filters or []:
+            for i, local_filters in enumerate(per_shard):
+                if local_filters is not None:
+                    local = self._local_condition(*condition, i)
+                    per_shard[i] = None if local is None else local_filters + [local]
+        return per_shard
+
+    def _local_condition(self, column, operator, value, index):
+        """One filter as shard `index` sees it, or None when no row of that shard can match it."""
+        if column not in ('id', 'rowid') or operator == 'is_null':
+            return column, operator, value
+        if operator == 'eq':
+            return (column, 'eq', int(value) // self.shard_count) if int(value) % self.shard_count == index else None
+        if operator == 'in':
+            local_ids = [int(v) // self.shard_count for v in value if int(v) % self.shard_count == index]
+            return (column, 'in', local_ids) if local_ids else None
+        if operator == 'range':
+            # low <= local * shards + index < high, rounded up to whole local ids
+            low, high = (None if bound is None else -((index - int(bound)) // self.shard_count) for bound in value)
+            return column, 'range', (low, high)
+        raise ValueError(f"Cannot filter {column} with '{operator}' on sharded contacts")
+
+    def _merge(self, results, limit, offset, order_by=None):
+        """
+        Merge per-shard result lists into one list and apply the page window.
+        Rows are ordered by global id, or by `order_by` (same syntax as `CrudOperations.fetch_all`) then id.
+        """
+        rows = [self._to_global(row, i) for i, shard_rows in enumerate(results) for row in shard_rows or []]
+        if isinstance(order_by, str):
+            order_by = [order_by]
+        # Stable sorts from the last key to the first give a multi-key sort with mixed directions
+        rows.sort(key=lambda row: row['id'])
+        for item in reversed(order_by or []):
+            column = item.lstrip('-')
+            rows.sort(key=lambda row: (row[column] is not None, row[column]), reverse=item.startswith('-'))
+        return rows[offset:offset + limit]
+
+    def add(self, **fields):
+        index = self.shard_for_phone(fields['phone'])
+        return self._call(index, self.shards[index].add, **fields)
+
+    def bulk_add(self, records, partial=False):
+        """
+        Split the records by shard and insert every group in parallel.
+        Returns the total row count, or with `partial=True` the merged {'inserted', 'errors'} result
+        with error indexes pointing into the original `records` list.
+        """
+        if not records:
+            return {'inserted': 0, 'errors': []} if partial else 0
+        groups = {}
+        for position, record in enumerate(records):
+            groups.setdefault(self.shard_for_phone(record['phone']), []).append(position)
+        futures = {i: self._submit(i, self.shards[i].bulk_add, [records[p] for p in positions], partial=partial)
+                   for i, positions in groups.items()}
+        if not partial:
+            return sum(future.result() or 0 for future in futures.values())
+
+        inserted, errors = 0, []
+        for i, future in futures.items():
+            result = future.result()
+            inserted += result['inserted']
+            errors.extend(dict(error, index=groups[i][error['index']]) for error in result['errors'])
+        errors.sort(key=lambda error: error['index'])
+        return {'inserted': inserted, 'errors': errors}
+
+    def update(self, where, **fields):
+        index, local_where = self._route(where)
+        if 'phone' in fields:
+            if index is None:
+                raise ValueError("Changing a phone number requires selecting the contact by id or phone")
+            target = self.shard_for_phone(fields['phone'])
+            if target != index:
+                return self._move(index, target, local_where, fields)
+        if index is None:
+            return self._scatter('update', where, **fields)
+        return self._call(index, self.shards[index].update, local_where, **fields)
+
+    def _move(self, source, target, local_where, fields):
+        """Move a contact whose new phone number belongs to another shard (not atomic across files)."""
+        existing = self._call(source, self.shards[source].fetch_one, **local_where)
+        if not existing:
+            return
+        moved = {k: v for k, v in existing.items() if k not in ('id', 'created_at', 'updated_at')}
+        moved.update(fields)
+        self._call(target, self.shards[target].add, **moved)
+        self._call(source, self.shards[source].delete, id=existing['id'])
+
+    def delete(self, **where):
+        index, local_where = self._route(where)
+        if index is None:
+            return self._scatter('delete', **where)
+        return self._call(index, self.shards[index].delete, **local_where)
+
+    def fetch_one(self, **where):
+        index, local_where = self._route(where)
+        if index is not None:
+            return self._to_global(self._call(index, self.shards[index].fetch_one, **local_where), index)
+        for i, row in enumerate(self._scatter('fetch_one', **where)):
+            if row:
+                return self._to_global(row, i)
+        return None
+
+    def fetch_all(self, limit=10, offset=0, columns=None, order_by=None, filters=None, **where):
+        index, local_where = self._route(where)
+        shard_filters = self._local_filters(filters)
+        if index is not None:
+            if shard_filters[index] is None:
+                return []
+            rows = self._call(index, self.shards[index].fetch_all, limit=limit, offset=offset, columns=columns,
+                              order_by=order_by, filters=shard_filters[index], **local_where)
+            return [self._to_global(row, index) if 'id' in row else row for row in rows]
+
+        # The merge needs the id and the sort columns, even if the caller did not ask for them
+        extra = []
+        if columns:
+            order_columns = [order_by] if isinstance(order_by, str) else list(order_by or [])
+            extra = [c for c in dict.fromkeys(['id'] + [c.lstrip('-') for c in order_columns]) if c not in columns]
+            columns = list(columns) + extra
+        # Every shard has to return enough rows to cover the requested page before merging
+        futures = [self._submit(i, shard.fetch_all, limit=limit + offset, offset=0, columns=columns, order_by=order_by,
+                                filters=local_filters, **where) if local_filters is not None else None
+                   for i, (shard, local_filters) in enumerate(zip(self.shards, shard_filters))]
+        results = [future.result() if future else [] for future in futures]
+        rows = self._merge(results, limit, offset, order_by)
+        for row in rows:
+            for column in extra:
+                del row[column]
+        return rows
+
+    def search_contact(self, search_term, limit=10, offset=0):
+        results = self._scatter('search_contact', search_term, limit=limit + offset, offset=0)
+        return self._merge(results, limit, offset)
+
+    def get_all_contacts(self, limit=10, offset=0):
+        return self.fetch_all(limit=limit, offset=offset)
+
+    def count_contacts(self, search_term=None):
+        return sum(count or 0 for count in self._scatter('count_contacts', search_term))
+
+    def contact_stats(self):
+        """Add up the per-shard counters."""
+        stats = {'total': 0, 'with_email': 0, 'area_codes': {}}
+        for shard_stats in self._scatter('contact_stats'):
+            stats['total'] += shard_stats['total']
+            stats['with_email'] += shard_stats['with_email']
+            for area_code, count in shard_stats['area_codes'].items():
+                stats['area_codes'][area_code] = stats['area_codes'].get(area_code, 0) + count
+        return stats
+
+    def rebuild_stats(self):
+        """Rebuild the counters of every shard; the corrected drift is keyed 'shard<i>:<key>'."""
+        return {f"shard{i}:{key}": values
+                for i, drift in enumerate(self._scatter('rebuild_stats')) for key, values in drift.items()}
+
+    def count_per_shard(self):
+        """Return the number of contacts stored in each shard, useful to check the partitioning balance."""
+        return [count or 0 for count in self._scatter('count_contacts')]
+
+    def find_by_phone(self, phone):
+        index = self.shard_for_phone(phone)
+        return self._to_global(self._call(index, self.shards[index].find_by_phone, phone), index)
+
+    def update_contact_by_phone(self, phone, **fields):
+        """Update contact by phone number."""
+        self.update({'phone': phone}, **fields)
+
+    def update_contact_by_id(self, contact_id, **fields):
+        """Update contact by contact ID."""
+        self.update({'id': contact_id}, **fields)
+
+    def close(self):
+        """Close every shard connection on its own thread and stop the worker threads."""
+        for i, shard in enumerate(self.shards):
+            self._call(i, shard.close)
+        for executor in self.executors:
+            executor.shutdown(wait=True)
@@ -0,0 +1,175 @@
+import json
+import re
+from difflib import SequenceMatcher
+
+from utils.logger import setup_logger
+
+app_logger = setup_logger('app_logger', 'logs/app.log')
+
+MERGE_FIELDS = ['first_name', 'last_name', 'email', 'address']
+
+
+class DedupService:
+    """
+    Whole-table detection and merging of near-duplicate contacts.
+
+    Contacts are grouped into blocks that share a blocking key (normalized name, email or phone digits).
+    Inside a block the rows are sorted and only compared with their `window` nearest neighbours, so the
+    job stays close to O(n log n) even when a block (a common name) is large. Pairs scoring at least
+    `threshold` are joined into clusters. Joining is transitive (A~B and B~C puts A and C together), so a
+    cluster is only proposed with the members that score at least `threshold` against its survivor; the rest
+    is split off and clustered around its own survivor.
+    """
+
+    def __init__(self, contacts, threshold=0.85, window=10, read_batch=5000):
+        self.contacts = contacts
+        self.threshold = threshold
+        self.window = window
+        self.read_batch = read_batch
+
+    @staticmethod
+    def _letters(value):
+        return re.sub(r'[^a-z]', '', (value or '').lower())
+
+    @staticmethod
+    def _digits(value):
+        return re.sub(r'\D', '', value or '')
+
+    def _load(self):
+        """Read the contacts in id order with keyset pagination, keeping only the compact comparison keys."""
+        rows = {}
+        last_id = 0
+        query = (f"SELECT id, first_name, last_name, phone, email FROM {self.contacts.table} "
+                 f"WHERE id > ? ORDER BY id LIMIT ?")
+        while True:
+            batch = self.contacts.fetchall(query, (last_id, self.read_batch))
+            if not batch:
+                return rows
+            for row in batch:
+                rows[row['id']] = (
+                    self._letters(row['first_name']) + ' ' + self._letters(row['last_name']),
+                    (row['email'] or '').strip().lower(),
+                    self._digits(row['phone']),
+                )
+            last_id = batch[-1]['id']
+
+    @staticmethod
+    def _blocks(rows):
+        blocks = {}
+        for contact_id, (name, email, digits) in rows.items():
+            blocks.setdefault('name:' + name, []).append(contact_id)
+            if email:
+                blocks.setdefault('email:' + email, []).append(contact_id)
+            if digits:
+                blocks.setdefault('phone:' + digits, []).append(contact_id)
+        return [ids for ids in blocks.values() if len(ids) > 1]
+
+    @staticmethod
+    def score(a, b):
+        """Score two (name, email, digits) keys between 0 and 1."""
+        name_a, email_a, digits_a = a
+        name_b, email_b, digits_b = b
+        name_score = 1.0 if name_a == name_b else SequenceMatcher(None, name_a, name_b).ratio()
+        if digits_a == digits_b:
+            phone_score = 1.0
+        elif len(digits_a) == len(digits_b) and digits_a:
+            # Typos in an otherwise equal-length number: share of positions that still match
+            phone_score = sum(x == y for x, y in zip(digits_a, digits_b)) / len(digits_a)
+        else:
+            phone_score = 0.0
+        if email_a and email_b:
+            email_score = 1.0 if email_a == email_b else 0.0
+            return 0.4 * name_score + 0.3 * email_score + 0.3 * phone_score
+        return 0.55 * name_score + 0.45 * phone_score
+
+    def find_duplicates(self):
+        """
+        Scan the whole table and return merge proposals, one per cluster of duplicates:
+        {'survivor_id', 'duplicate_ids', 'score', 'approved'}. The oldest contact (lowest id) survives.
+        """
+        rows = self._load()
+        parent = {}
+
+        def find(contact_id):
+            root = contact_id
+            while parent.get(root, root) != root:
+                root = parent[root]
+            parent[contact_id] = root
+            return root
+
+        matched = set()
+        for ids in self._blocks(rows):
+            ids.sort(key=lambda contact_id: rows[contact_id])
+            for i, contact_id in enumerate(ids):
+                for other_id in ids[i + 1:i + 1 + self.window]:
+                    if self.score(rows[contact_id], rows[other_id]) < self.threshold:
+                        continue
+                    root_a, root_b = find(contact_id), find(other_id)
+                    if root_a != root_b:
+                        parent[max(root_a, root_b)] = min(root_a, root_b)
+                    matched.update((contact_id, other_id))
+
+        clusters = {}
+        for contact_id in matched:
+            clusters.setdefault(find(contact_id), []).append(contact_id)
+
+        proposals = []
+        for members in clusters.values():
+            remaining = sorted(members)
+            while len(remaining) > 1:
+                survivor, others = remaining[0], remaining[1:]
+                scores = {other: self.score(rows[survivor], rows[other]) for other in others}
+                duplicates = [other for other in others if scores[other] >= self.threshold]
+                remaining = [other for other in others if scores[other] < self.threshold]
+                if duplicates:
+                    proposals.append({
+                        'survivor_id': survivor,
+                        'duplicate_ids': duplicates,
+                        'score': round(min(scores[other] for other in duplicates), 3),
+                        'approved': False,
+                    })
+        proposals.sort(key=lambda proposal: proposal['survivor_id'])
+        app_logger.info(f"Duplicate scan of {len(rows)} contacts produced {len(proposals)} merge proposals")
+        return proposals
+
+    @staticmethod
+    def save_proposals(proposals, path):
+        """Write proposals to a JSON file so an operator can review them and set `approved`."""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(proposals, f, indent=2)
+
+    @staticmethod
+    def load_proposals(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def apply(self, proposals, batch_size=500):
+        """
+        Apply the approved proposals, one transaction per batch of `batch_size` proposals.
+        Empty fields of the survivor are filled in from its duplicates, then the duplicates are deleted.
+        Returns the number of deleted duplicates.
+        """
+        approved = [proposal for proposal in proposals if proposal.get('approved')]
+        merged = 0
+        for start in range(0, len(approved), batch_size):
+            merges = [self._build_merge(proposal) for proposal in approved[start:start + batch_size]]
+            merged += self.contacts.merge_contacts([merge for merge in merges if merge])
+        app_logger.info(f"Merged {merged} duplicate contacts from {len(approved)} approved proposals")
+        return merged
+
+    def _build_merge(self, proposal):
+        ids = [proposal['survivor_id']] + list(proposal['duplicate_ids'])
+        placeholders = ', '.join('?' for _ in ids)
+        rows = self.contacts.fetchall(
+            f"SELECT * FROM {self.contacts.table} WHERE id IN ({placeholders}) ORDER BY id", tuple(ids))
+        survivor = next((row for row in rows if row['id'] == proposal['survivor_id']), None)
+        if survivor is None:
+            return None  # Already merged or deleted since the scan
+        fields = {}
+        for field in MERGE_FIELDS:
+            if not survivor[field]:
+                value = next((row[field] for row in rows if row[field]), None)
+                if value:
+                    fields[field] = value
+        duplicate_ids = [row['id'] for row in rows if row['id'] != survivor['id']]
+        return survivor['id'], duplicate_ids, fields
@@ -0,0 +1,103 @@
+import os
+import re
+import tempfile
+
+from app.models.contact import Contacts
+
+SAMPLE_PHONE = '(555)000-0001'
+
+# Every query shape `Contacts` and `CrudOperations` generate, exercised through their public methods
+QUERY_SHAPES = [
+    ('find_by_phone', lambda c: c.find_by_phone(SAMPLE_PHONE)),
+    ('fetch_one(id)', lambda c: c.fetch_one(id=1)),
+    ('fetch_one(phone)', lambda c: c.fetch_one(phone=SAMPLE_PHONE)),
+    ('fetch_all()', lambda c: c.fetch_all()),
+    ('fetch_all(last_name)', lambda c: c.fetch_all(last_name='Doe')),
+    ('fetch_all(first_name)', lambda c: c.fetch_all(first_name='John')),
+    ('fetch_all(email)', lambda c: c.fetch_all(email='john@example.com')),
+    ('get_all_contacts', lambda c: c.get_all_contacts(limit=10, offset=10)),
+    ('fetch_all(last_name prefix, order last_name)',
+     lambda c: c.fetch_all(filters=[('last_name', 'prefix', 'Do')], order_by='last_name')),
+    ('fetch_all(created_at range, order -created_at)',
+     lambda c: c.fetch_all(filters=[('created_at', 'range', ('2024-09-01', '2024-10-01'))],
+                           order_by='-created_at', columns=['id', 'phone'])),
+    ('fetch_all(id in)', lambda c: c.fetch_all(filters=[('id', 'in', [1, 2, 3])])),
+    ('fetch_all(email is_null)', lambda c: c.fetch_all(filters=[('email', 'is_null', True)])),
+    ('iter_all(updated_at range, order updated_at)',
+     lambda c: list(c.iter_all(filters=[('updated_at', 'range', ('2024-09-01', None))], order_by='updated_at'))),
+    ('search_contact', lambda c: c.search_contact('Jo')),
+    ('count_contacts(search_term)', lambda c: c.count_contacts('Jo')),
+    ('count_contacts()', lambda c: c.count_contacts()),
+    ('contact_stats', lambda c: c.contact_stats()),
+    ('update_contact_by_phone', lambda c: c.update_contact_by_phone(SAMPLE_PHONE, email='john@example.com')),
+    ('update_contact_by_id', lambda c: c.update_contact_by_id(1, address='1 Main St')),
+    ('delete(phone)', lambda c: c.delete(phone=SAMPLE_PHONE)),
+    ('delete(id)', lambda c: c.delete(id=1)),
+]
+
+# Full scans that are inherent to the query and accepted, with the reason
+EXPECTED_FULL_SCANS = {
+    'fetch_all()': "paginated walk in rowid order, stops after OFFSET + LIMIT rows",
+    'get_all_contacts': "paginated walk in rowid order, stops after OFFSET + LIMIT rows",
+    'search_contact': "infix LIKE '%term%' cannot use a B-tree index",
+    'count_contacts(search_term)': "infix LIKE '%term%' cannot use a B-tree index",
+    'contact_stats': "reads the few rows of the contacts_stats counter table",
+}
+
+
+class DiagnosticsService:
+    """
+    Runs EXPLAIN QUERY PLAN over every SQL statement the contacts model generates.
+
+    The statements are captured with a trace callback while the model methods run against a scratch
+    database, then explained against the real database so its actual indexes are checked. Full table
+    scans and temporary B-trees (sorts) are flagged unless listed in EXPECTED_FULL_SCANS.
+    """
+
+    def __init__(self, db_name='phonebook.db'):
+        self.db_name = db_name
+
+    @staticmethod
+    def capture_queries():
+        """Return [(label, sql)] for every query shape, with the parameters inlined."""
+        captured = []
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            scratch = Contacts(os.path.join(tmp_dir, 'scratch.db'))
+            scratch.add(first_name='John', last_name='Doe', phone=SAMPLE_PHONE)
+            for label, run in QUERY_SHAPES:
+                statements = []
+                scratch.set_trace(statements.append)
+                run(scratch)
+                scratch.set_trace(None)
+                # Trigger programs report their parent statement again, hence the de-duplication
+                captured.extend((label, sql) for sql in dict.fromkeys(statements)
+                                if re.match(r'\s*(SELECT|UPDATE|DELETE)\b', sql, re.IGNORECASE))
+            scratch.close()
+        return captured
+
+    @staticmethod
+    def find_problems(plan):
+        """Return the plan lines that mean a full table scan or a temporary sort."""
+        return [detail for detail in plan
+                if detail.startswith('SCAN') or 'USE TEMP B-TREE' in detail]
+
+    def diagnose(self):
+        """Explain every captured query; returns one dictionary per query with its plan and problems."""
+        contacts = Contacts(self.db_name)
+        report = []
+        for label, sql in self.capture_queries():
+            plan = [row['detail'] for row in contacts.fetchall(f"EXPLAIN QUERY PLAN {sql}")]
+            report.append({
+                'label': label,
+                'sql': sql,
+                'plan': plan,
+                'problems': self.find_problems(plan),
+                'expected': EXPECTED_FULL_SCANS.get(label),
+            })
+        contacts.close()
+        return report
+
+    @staticmethod
+    def unexpected_problems(report):
+        """Only the entries with problems that are not accepted in EXPECTED_FULL_SCANS."""
+        return [entry for entry in report if entry['problems'] and not entry['expected']]
@@ -4,7 +4,11 @@ import re
 
 from tabulate import tabulate
 
+from app.models.change_log import DEFAULT_MAX_ROWS, ChangeLog
 from app.models.contact import Contacts
+from app.models.sharded_contacts import ShardedContacts
+from data.database import is_lock_error
+from data.maintenance import Maintenance
 from utils.utils import error_reporter
 from utils.logger import setup_logger  # Import the logger setup
 
@@ -14,11 +18,31 @@ app_logger = setup_logger('app_logger', 'logs/app.log')
 # Audit log
 audit_logger = setup_logger('audit_logger', 'logs/audit.log')
 
+# Imports at least this large refresh the query planner statistics afterwards
+LARGE_IMPORT_ROWS = 1000
+
 
 class PhoneBookService:
 
-    def __init__(self):
-        self.contacts = Contacts()
+    def __init__(self, contacts=None, writer=None, change_log_rows=DEFAULT_MAX_ROWS):
+        # Any object with the `Contacts` interface works here, e.g. a `ShardedContacts` router
+        self.contacts = contacts if contacts is not None else Contacts()
+        # Optional `GroupCommitWriter`: single-contact writes are then coalesced into group commits
+        self.writer = writer
+        # Compiled field rules shared by the interactive, CSV import and API paths
+        self.validator = self.contacts.validator
+        # One maintenance handle per database file (a sharded backend has several)
+        database_files = self.contacts.shard_paths if isinstance(self.contacts, ShardedContacts) else [
+            self.contacts.db_name]
+        self.maintenance = [Maintenance(path) for path in database_files]
+        # The change logs are compacted in idle time once they hold more than `change_log_rows` changes
+        self.change_log_rows = change_log_rows
+        self.change_logs = [ChangeLog(path) for path in database_files]
+        for change_log in self.change_logs:
+            # Like the maintenance handles: give way to real users, the next idle period tries again
+            change_log.busy_timeout = 0.05
+            change_log.max_retries = 0
+            change_log.close()
 
     def _prompt_user_choice(self):
         """Prompt the user for their choice on how to handle duplicate phone number."""
@@ -37,16 +61,21 @@ class PhoneBookService:
     def add_contact(self, first_name, last_name, phone, email=None, address=None):
         """Add a new contact and display the result."""
         # Construct new contact data
-        new_data = {
+        new_data, errors = self.validator.validate({
             "first_name": first_name,
             "last_name": last_name,
             "phone": phone,
             "email": email,
             "address": address
-        }
+        })
+        if errors:
+            raise ValueError('; '.join(errors.values()))
 
         # Add the contact
-        self.contacts.add(**new_data)
+        if self.writer:
+            self.writer.add(**new_data).result()  # Wait for the group commit that includes this write
+        else:
+            self.contacts.add(**new_data)
 
         # Log the action
         app_logger.info(f"Added new contact: {first_name} {last_name}, Phone: {phone}")
@@ -69,12 +98,16 @@ class PhoneBookService:
     @error_reporter
     def update_contact_by_phone(self, phone, **fields):
         """Update contact information."""
-        # Validate and format the phone number if it's in the fields to be updated
-        if 'phone' in fields:
-            fields['phone'] = self._validate_and_format_phone(fields['phone'])
+        # Validate and normalize the fields to be updated (e.g. format the phone number)
+        fields, errors = self.validator.validate(fields, partial=True)
+        if errors:
+            raise ValueError('; '.join(errors.values()))
 
         # Pass the phone as a dictionary for the WHERE clause
-        self.contacts.update({'phone': phone}, **fields)
+        if self.writer:
+            self.writer.update({'phone': phone}, **fields).result()
+        else:
+            self.contacts.update({'phone': phone}, **fields)
 
         # Log the update action
         app_logger.info(f"Updated contact with phone: {phone}, Fields: {fields}")
@@ -85,7 +118,10 @@ class PhoneBookService:
     @error_reporter
     def delete_contact(self, phone):
         """Delete a contact."""
-        self.contacts.delete(**{"phone": phone})
+        if self.writer:
+            self.writer.delete(**{"phone": phone}).result()
+        else:
+            self.contacts.delete(**{"phone": phone})
 
         # Log the deletion in both app and audit logs
         app_logger.info(f"Deleted contact with phone: {phone}")
@@ -173,20 +209,15 @@ class PhoneBookService:
     def _validate_and_format_phone(self, phone, check_duplicata=True, reinput=True):
         """Validate, format and check for duplicate phone number."""
         while True:
-            if re.match(r'^\(\d{3}\)\d{3}-\d{4}$', phone):
-                phone = re.sub(r'[^\d]', '', phone)
-            elif re.match(r'^\d{10}$', phone):
-                pass
-            else:
-                print(f"{phone} is invalid phone number format. Please enter in (xxx)xxx-xxxx or xxxxxxxxxx format.")
+            formatted_phone, error = self.validator.validate_field('phone', phone)
+            if error:
+                print(error)
                 if reinput:
                     phone = input("Re-enter phone number: ").strip()
                     continue
                 else:
                     return None
 
-            formatted_phone = f"({phone[:3]}){phone[3:6]}-{phone[6:]}"
-
             if check_duplicata:
                 existing_contact = self.contacts.find_by_phone(formatted_phone)
                 if existing_contact:
@@ -214,10 +245,11 @@ class PhoneBookService:
     def _validate_email(self, email, reinput=True):
         """Validate email format."""
         while email:
-            if re.match(r'^\S+@\S+\.\S+$', email):
+            email, error = self.validator.validate_field('email', email)
+            if not error:
                 return email
             else:
-                print(f"{email} is invalid email format. Please enter a valid email.")
+                print(error)
                 if reinput:
                     email = input("Re-enter email (optional, press enter to skip): ").strip()
                 else:
@@ -227,10 +259,11 @@ class PhoneBookService:
     def _validate_name(self, name, field_name, reinput=True):
         """Validate that the name is not empty and contains only letters."""
         while True:
-            if name and name.isalpha():
-                return name
+            value, error = self.validator.validate_field(field_name.replace(' ', '_'), name or '')
+            if not error:
+                return value
             else:
-                print(f"Invalid {field_name}. It must only contain letters and cannot be empty.")
+                print(error)
                 if reinput:
                     name = input(f"Re-enter {field_name}: ").strip()
                 else:
@@ -388,9 +421,14 @@ class PhoneBookService:
     @error_reporter
     def display_summary(self):
         """Display a summary of the contacts in the phone book."""
-        total_contacts = self.contacts.count_contacts()
+        stats = self.contacts.contact_stats()  # Trigger-maintained counters, no table scan
+        total_contacts = stats['total']
         print("\n--- Phone Book Summary ---")
         print(f"Total Contacts: {total_contacts}")
+        if total_contacts > 0:
+            print(f"With email: {stats['with_email']}")
+            top_areas = sorted(stats['area_codes'].items(), key=lambda item: (-item[1], item[0]))[:5]
+            print("Top area codes: " + ', '.join(f"{area_code} ({count})" for area_code, count in top_areas))
 
         if total_contacts > 0:
             print("Here are a few of your contacts:")
@@ -441,40 +479,44 @@ class PhoneBookService:
         successful_records = []
 
         if records:
-            for record in records:
-                try:
-                    # Validate each record before adding
-                    first_name = self._validate_name(record['first_name'], 'first name', reinput=False)
-                    last_name = self._validate_name(record['last_name'], 'last name', reinput=False)
-                    phone = self._validate_and_format_phone(record['phone'], check_duplicata=True, reinput=False)
-                    email = self._validate_email(record.get('email'), reinput=False)
-                    address = record.get('address') if record.get('address') else None
-                    # If all validations pass, add to valid_records
-                    if first_name and last_name and phone:
-                        record['first_name'] = first_name
-                        record['last_name'] = last_name
-                        record['phone'] = phone
-                        record['email'] = email
-                        record['address'] = address
-                        valid_records.append(record)
-                    else:
-                        raise ValueError("Record contains invalid or missing fields.")
-
-                except ValueError as e:
+            # Validate the whole file in one call, then check the survivors for existing phone numbers
+            clean_records, errors = self.validator.validate_batch(records)
+            for record, clean_record, record_errors in zip(records, clean_records, errors):
+                if set(record_errors) == {'email'}:
+                    # The email is optional: as always for imports, a bad one is dropped (stored as NULL), not the row
+                    app_logger.warning(f"Importing {record} without its email - {record_errors['email']}")
+                    clean_record['email'] = None
+                    record_errors = {}
+                if not record_errors and self.contacts.find_by_phone(clean_record['phone']):
+                    record_errors = {'phone': f"Phone number {clean_record['phone']} already exists"}
+                if record_errors:
                     # Log specific error for each failed record
+                    error = '; '.join(record_errors.values())
                     failed_records.append({
                         'record': record,
-                        'error': str(e)
+                        'error': error
                     })
-                    app_logger.warning(f"Skipping invalid record: {record} - {str(e)}")
+                    app_logger.warning(f"Skipping invalid record: {record} - {error}")
                     continue
+                valid_records.append(clean_record)
 
             if valid_records:
-                # Now pass only valid records to the bulk add function
-                self.bulk_add_contacts(valid_records)
-                success_count = len(valid_records)
-                successful_records = valid_records  # Collect the successful records for display
+                # Now pass only valid records to the bulk add function; rows rejected by the database
+                # (e.g. a duplicate phone within the file) are reported without failing the whole batch
+                result = self.bulk_add_contacts(valid_records)
+                if result is None:
+                    # The whole batch failed (e.g. the database stayed locked) and was rolled back
+                    rejected = {index: "Bulk insert failed, nothing was written (see the error log)"
+                                for index in range(len(valid_records))}
+                else:
+                    rejected = {error['index']: error['error'] for error in result['errors']}
+                for index, error in rejected.items():
+                    failed_records.append({'record': valid_records[index], 'error': error})
+                successful_records = [record for index, record in enumerate(valid_records) if index not in rejected]
+                success_count = len(successful_records)
                 app_logger.info(f"Bulk added contacts from CSV file: {csv_file_path}, Total records: {success_count}")
+                if success_count >= LARGE_IMPORT_ROWS:
+                    self.optimize_after_import()
 
         return {
             'success_count': success_count,
@@ -485,10 +527,11 @@ class PhoneBookService:
 
     @error_reporter
     def bulk_add_contacts(self, records):
-        """Bulk add contacts with error handling and logging."""
-        success_count = self.contacts.bulk_add(records)
+        """Bulk add contacts with error handling and logging; bad rows are skipped, not fatal."""
+        result = self.contacts.bulk_add(records, partial=True)
         app_logger.info(
-            f"Bulk add completed: {success_count} contacts successfully added")
+            f"Bulk add completed: {result['inserted']} contacts successfully added, {len(result['errors'])} rejected")
+        return result
 
     @error_reporter
     def _parse_csv(self, csv_file_path):
@@ -554,5 +597,59 @@ class PhoneBookService:
 
         print("Batch delete completed successfully.")
 
+        if deleted_contacts:
+            # Hand some of the freed pages back right away; the rest is released in idle time
+            self.run_idle_maintenance()
+
+    @error_reporter
+    def run_idle_maintenance(self, max_seconds=0.05):
+        """
+        Release free pages in small bounded steps so the write lock is never held for long, and keep the change
+        logs within `change_log_rows` changes.
+        """
+        released = sum(maintenance.incremental_vacuum(max_seconds=max_seconds) for maintenance in self.maintenance)
+        if released:
+            app_logger.info(f"Incremental vacuum released {released} pages")
+        for change_log in self.change_logs:
+            try:
+                compacted = change_log.compact_if_needed(self.change_log_rows)
+            except Exception as e:
+                if not is_lock_error(e.__cause__):
+                    raise
+                continue  # Busy, try again next idle period
+            if compacted:
+                app_logger.info(f"Compacted the change log of {change_log.db_name}: removed {compacted} changes")
+        return released
+
+    @error_reporter
+    def optimize_after_import(self):
+        """Refresh the planner statistics after a large import."""
+        for maintenance in self.maintenance:
+            maintenance.optimize()
+        app_logger.info("Ran PRAGMA optimize after a large import")
+
+    def close(self):
+        """
+        Stop the writer (it commits what is still queued), then close the maintenance and change-log handles
+        and the backend.
+        """
+        if self.writer:
+            self.writer.close()
+        for maintenance in self.maintenance:
+            maintenance.close()
+        for change_log in self.change_logs:
+            change_log.close()
+        self.contacts.close()
+
+    @error_reporter
+    def display_maintenance_report(self):
+        """Display the fragmentation of each database file."""
+        print("\n--- Storage Report ---")
+        for maintenance in self.maintenance:
+            report = maintenance.fragmentation()
+            print(f"{maintenance.db_name}: {report['page_count']} pages of {report['page_size']} bytes, "
+                  f"{report['freelist_count']} free ({report['ratio']:.1%}), auto_vacuum={report['auto_vacuum']}")
+        print("----------------------")
+
 
 
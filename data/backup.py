@@ -0,0 +1,149 @@
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+
+class _TooManyRestarts(Exception):
+    """Raised from the progress callback to abort a step-wise copy that writers keep restarting."""
+
+
+class BackupManager:
+    """
+    Online snapshots of a live database through the SQLite backup API.
+
+    The copy is made `pages` pages at a time; between steps the source lock is released so readers and
+    writers carry on, and an optional `throttle` pause keeps the backup from hogging the disk. If another
+    connection writes to the source during the copy SQLite restarts the copy, so the snapshot is always
+    a consistent point-in-time image. Under a steady stream of writes the copy could restart forever, so after
+    `max_restarts` restarts the rest is copied in a single step, which holds the source's read lock (and makes
+    writers wait) until it is done.
+    """
+
+    def __init__(self, db_name='phonebook.db', pages=256, throttle=0.0, timeout=30.0, progress=None,
+                 max_restarts=10):
+        self.db_name = db_name
+        self.pages = pages
+        self.throttle = throttle
+        self.timeout = timeout
+        self.progress = progress  # Optional callable(copied_pages, total_pages)
+        self.max_restarts = max_restarts
+        self.restarts = 0  # Restarts of the last copy
+        self._copied = 0
+
+    def _on_step(self, status, remaining, total):
+        copied = total - remaining
+        if copied <= self._copied:  # No progress: another connection wrote to the source and SQLite started over
+            self.restarts += 1
+            if self.restarts > self.max_restarts:
+                raise _TooManyRestarts()
+        self._copied = copied
+        if self.progress:
+            self.progress(total - remaining, total)
+        if self.throttle:
+            time.sleep(self.throttle)
+
+    def _copy(self, source_path, target_path):
+        source = sqlite3.connect(source_path, timeout=self.timeout)
+        target = sqlite3.connect(target_path, timeout=self.timeout)
+        self.restarts = self._copied = 0
+        try:
+            try:
+                source.backup(target, pages=self.pages, progress=self._on_step)
+            except _TooManyRestarts:
+                self._copied = 0
+                source.backup(target, pages=-1, progress=self._on_step)  # One step cannot be restarted
+        finally:
+            source.close()
+            target.close()
+
+    @staticmethod
+    def check_integrity(path):
+        """Run PRAGMA integrity_check on a database file and raise if it reports any problem."""
+        conn = sqlite3.connect(path)
+        try:
+            result = [row[0] for row in conn.execute("PRAGMA integrity_check").fetchall()]
+        finally:
+            conn.close()
+        if result != ['ok']:
+            raise sqlite3.DatabaseError(f"Integrity check failed for {path}: {'; '.join(result[:5])}")
+
+    def backup(self, destination, verify=True, compress=False):
+        """
+        Write a snapshot of the database to `destination`.
+        The file only appears once it is complete (and verified), so a half-written snapshot is never left behind.
+        Returns a summary dictionary.
+        """
+        started = time.monotonic()
+        directory = os.path.dirname(os.path.abspath(destination))
+        fd, tmp_path = tempfile.mkstemp(suffix='.db', dir=directory)
+        os.close(fd)
+        try:
+            self._copy(self.db_name, tmp_path)
+            if verify:
+                self.check_integrity(tmp_path)
+            if compress:
+                with open(tmp_path, 'rb') as raw, gzip.open(destination + '.part', 'wb') as packed:
+                    shutil.copyfileobj(raw, packed)
+                os.replace(destination + '.part', destination)
+            else:
+                os.replace(tmp_path, destination)
+        finally:
+            for leftover in (tmp_path, destination + '.part'):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+
+        return {
+            'destination': destination,
+            'size': os.path.getsize(destination),
+            'compressed': compress,
+            'verified': verify,
+            'seconds': time.monotonic() - started,
+        }
+
+    def backup_in_background(self, destination, verify=True, compress=False):
+        """Start a backup on a background thread and return the `BackupThread` (join it to wait)."""
+        thread = BackupThread(self, destination, verify, compress)
+        thread.start()
+        return thread
+
+    def restore(self, snapshot, verify=True):
+        """
+        Replace the contents of the database with a snapshot (plain or gzip-compressed).
+        The restore goes through the backup API as well, so open connections see the switch atomically.
+        """
+        tmp_path = None
+        try:
+            if snapshot.endswith('.gz'):
+                fd, tmp_path = tempfile.mkstemp(suffix='.db')
+                with os.fdopen(fd, 'wb') as raw, gzip.open(snapshot, 'rb') as packed:
+                    shutil.copyfileobj(packed, raw)
+                snapshot = tmp_path
+            if verify:
+                self.check_integrity(snapshot)
+            self._copy(snapshot, self.db_name)
+        finally:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+class BackupThread(threading.Thread):
+    """Runs `BackupManager.backup` off the main thread and keeps its summary or error."""
+
+    def __init__(self, manager, destination, verify, compress):
+        super().__init__(name='phonebook-backup', daemon=True)
+        self.manager = manager
+        self.destination = destination
+        self.verify = verify
+        self.compress = compress
+        self.summary = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.summary = self.manager.backup(self.destination, self.verify, self.compress)
+        except Exception as e:
+            self.error = e
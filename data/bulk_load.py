@@ -0,0 +1,192 @@
+import os
+import sqlite3
+import time
+
+from data.migrations import CONTACT_STATS_REBUILD
+
+
+class BulkLoader:
+    """
+    Offline bulk load for the initial population of a database from a master file.
+
+    For the duration of the load the file is locked exclusively, journaling and fsync are switched off and
+    the secondary indexes and triggers of the table are dropped; rows are inserted in key order in large
+    transactions. Afterwards the indexes and triggers are recreated, ANALYZE and an integrity check run and
+    the safe settings are restored.
+
+    With journal_mode=OFF a crash in the middle of the load can leave the file corrupt, which is why the
+    loader refuses to run on a database that is in use: load into a new file and move it into place.
+    Triggers do not fire for loaded rows, so change-log readers have to resync fully afterwards; the
+    contacts_stats counters are rebuilt by the loader itself.
+    """
+
+    def __init__(self, db_name, table='contacts', validator=None, batch_size=100000, key='phone',
+                 presorted=False, progress=None, first_line=1):
+        self.db_name = db_name
+        self.table = table
+        self.validator = validator  # Optional `RecordValidator`; invalid records are reported, not loaded
+        self.batch_size = batch_size
+        self.key = key  # Unique column: rows are loaded in its order and duplicates are rejected up front
+        self.presorted = presorted
+        self.progress = progress  # Optional callable(loaded_rows)
+        self.first_line = first_line  # Line number reported for the first record, e.g. 2 below a CSV header
+
+    def _lock(self):
+        """Open the file with an exclusive lock, or raise RuntimeError if anything else is using it."""
+        for suffix in ('-journal', '-wal'):
+            side_file = self.db_name + suffix
+            if os.path.exists(side_file) and os.path.getsize(side_file) > 0:
+                raise RuntimeError(f"{self.db_name} looks live or was not shut down cleanly ({side_file} exists); "
+                                   f"refusing to bulk load")
+        conn = sqlite3.connect(self.db_name, timeout=0, isolation_level=None)
+        try:
+            conn.execute("PRAGMA locking_mode = EXCLUSIVE")  # Locks are kept until the connection closes
+            conn.execute("BEGIN EXCLUSIVE")
+            conn.execute("COMMIT")
+        except sqlite3.OperationalError as e:
+            conn.close()
+            raise RuntimeError(f"{self.db_name} is in use by another connection; refusing to bulk load") from e
+        return conn
+
+    def _secondary_objects(self, conn):
+        """DDL of the table's explicit indexes and triggers (automatic indexes have no SQL and are kept)."""
+        return conn.execute(
+            "SELECT type, name, sql FROM sqlite_master "
+            "WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL ORDER BY type, name",
+            (self.table,)
+        ).fetchall()
+
+    def _rebuild_stats(self, conn):
+        """Recompute the trigger-maintained counters, which the loaded rows bypassed."""
+        has_stats = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'contacts_stats'")
+        if self.table != 'contacts' or not has_stats.fetchone():
+            return
+        conn.execute("BEGIN")
+        for statement in CONTACT_STATS_REBUILD:
+            conn.execute(statement)
+        conn.execute("COMMIT")
+
+    def _prepare(self, conn, records):
+        """
+        Validate, de-duplicate and (unless presorted) sort the records; returns (rows, failed).
+        Unknown columns, missing NOT NULL values and duplicate keys are rejected here, with or without a
+        validator, because with journal_mode=OFF a failed statement cannot be rolled back safely.
+        """
+        table_info = conn.execute(f"PRAGMA table_info({self.table})").fetchall()
+        known = {column[1] for column in table_info}
+        # NOT NULL columns without a default (the INTEGER PRIMARY KEY is filled in by SQLite)
+        required = [column[1] for column in table_info if column[3] and column[4] is None and not column[5]]
+        seen = {row[0] for row in conn.execute(f"SELECT {self.key} FROM {self.table}")}
+        valid = []
+        failed = []
+        for line, record in enumerate(records, start=self.first_line):
+            if self.validator:
+                record, errors = self.validator.validate(record)
+                if errors:
+                    failed.append({'line': line, 'error': '; '.join(errors.values())})
+                    continue
+            unknown = [column for column in record if column not in known]
+            missing = [column for column in required if record.get(column) is None]
+            if unknown or missing:
+                failed.append({'line': line, 'error': '; '.join(
+                    [f"Unknown column {column}" for column in unknown] + [f"Missing {column}" for column in missing])})
+                continue
+            value = record.get(self.key)
+            if value is None or value in seen:
+                failed.append({'line': line, 'error': f"Missing or duplicate {self.key}: {value}"})
+                continue
+            seen.add(value)
+            valid.append((line, record))
+        if not self.presorted:
+            # Key order turns every insert into the unique index into an append at the right edge of the B-tree
+            valid.sort(key=lambda item: item[1][self.key])
+        return valid, failed
+
+    def load(self, records):
+        """
+        Load an iterable of dictionaries. Returns a summary with the loaded count, the failed lines and timings.
+        If the load fails once journaling is off, RuntimeError is raised (caused by the original error): the file
+        may then be half loaded or corrupt and must not be used.
+        """
+        started = time.monotonic()
+        conn = self._lock()
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+        try:
+            rows, failed = self._prepare(conn, records)
+            columns = list(dict.fromkeys(column for _, record in rows for column in record))
+            query = (f"INSERT INTO {self.table} ({', '.join(columns)}) "
+                     f"VALUES ({', '.join('?' for _ in columns)})")
+
+            conn.execute("PRAGMA journal_mode = OFF")
+            conn.execute("PRAGMA synchronous = OFF")
+            try:
+                dropped = self._secondary_objects(conn)
+                for object_type, name, _ in dropped:
+                    conn.execute(f"DROP {object_type.upper()} {name}")
+                try:
+                    loaded = 0
+                    for start in range(0, len(rows), self.batch_size):
+                        batch = rows[start:start + self.batch_size]
+                        conn.execute("BEGIN")
+                        conn.executemany(query, [tuple(record.get(column) for column in columns)
+                                                 for _, record in batch])
+                        conn.execute("COMMIT")
+                        loaded += len(batch)
+                        if self.progress:
+                            self.progress(loaded)
+                    load_seconds = time.monotonic() - started
+                except Exception:
+                    self._recreate(conn, dropped, ignore_errors=True)  # Best effort, the load error is what matters
+                    raise
+                self._recreate(conn, dropped)
+
+                conn.execute("ANALYZE")
+                result = [row[0] for row in conn.execute("PRAGMA integrity_check").fetchall()]
+                if result != ['ok']:
+                    raise sqlite3.DatabaseError(f"Integrity check failed after bulk load: {'; '.join(result[:5])}")
+            except Exception as e:
+                raise RuntimeError(f"Bulk load into {self.db_name} failed with journaling off: the file may be "
+                                   f"half loaded or corrupt and must not be used; restore it from a backup or "
+                                   f"load into a new file. Original error: {e}") from e
+        finally:
+            self._unlock(conn, journal_mode, synchronous)
+
+        return {
+            'loaded': loaded,
+            'failed': failed,
+            'load_seconds': load_seconds,
+            'total_seconds': time.monotonic() - started,
+        }
+
+    def _recreate(self, conn, dropped, ignore_errors=False):
+        """
+        End any open transaction, put the indexes back before the triggers and rebuild the counters.
+        With `ignore_errors` every step is still tried when an earlier one fails.
+        """
+        statements = ["COMMIT"] if conn.in_transaction else []  # ROLLBACK is undefined with journal_mode=OFF
+        statements += [sql for _, _, sql in sorted(dropped, key=lambda item: item[0] != 'index')]
+        for statement in statements:
+            try:
+                conn.execute(statement)
+            except sqlite3.Error:
+                if not ignore_errors:
+                    raise
+        try:
+            self._rebuild_stats(conn)
+        except sqlite3.Error:
+            if not ignore_errors:
+                raise
+
+    @staticmethod
+    def _unlock(conn, journal_mode, synchronous):
+        """Restore the safe settings and release the exclusive lock; every step runs even if an earlier one fails."""
+        statements = ["COMMIT"] if conn.in_transaction else []  # The pragmas cannot run inside a transaction
+        statements += [f"PRAGMA synchronous = {int(synchronous)}", f"PRAGMA journal_mode = {journal_mode}",
+                       "PRAGMA locking_mode = NORMAL"]
+        for statement in statements:
+            try:
+                conn.execute(statement)
+            except sqlite3.Error:
+                pass  # Closing the connection below still releases the lock
+        conn.close()
@@ -1,12 +1,14 @@
-import traceback
+import reprlib
+import time
 from utils.schema_parser import get_table_schema
 from utils.validators import validate_fields
-from data.database import Database  # Now inheriting from this class
+from data.database import Database, is_lock_error  # Now inheriting from this class
+from data.query_builder import QueryBuilder
 import sqlite3  # Assuming you're using sqlite3
 
 class CrudOperations(Database):
-    def __init__(self, table: str):
-        super().__init__()  # Initialize the Database class
+    def __init__(self, table: str, db_name='phonebook.db'):
+        super().__init__(db_name)  # Initialize the Database class
         self.table = table
         self.schema = get_table_schema(self, table)  # Use inherited Database methods
         self.conn.row_factory = sqlite3.Row  # Set the row factory to return dictionaries
@@ -14,61 +16,128 @@ class CrudOperations(Database):
     def transactional(func):
         """
         Transaction decorator to manage transaction lifecycle with enhanced error reporting.
+        The write lock is taken up front with BEGIN IMMEDIATE, so a concurrent writer waits in the busy handler
+        instead of failing half way through; transient lock errors are retried with jittered backoff and the
+        time spent waiting is recorded in `Database.stats`.
+        The arguments are summarized with `reprlib` so a failing 100k-row batch does not build a huge message;
+        the original exception and its traceback stay available as `__cause__`.
         """
         def wrapper(self, *args, **kwargs):
-            try:
-                self.connect()  # Use inherited Database connect method
-                self.conn.execute('BEGIN TRANSACTION')
-                result = func(self, *args, **kwargs)
-                self.conn.commit()
-                return result
-            except Exception as e:
-                self.conn.rollback()
-                error_details = traceback.format_exc()  # Get full stack trace
-                raise Exception(f"Error in {func.__name__} with args {args}, kwargs {kwargs}. "
-                                f"Original error: {e}\nTraceback: {error_details}")
-            finally:
-                self.close()
+            if getattr(self._local, 'streams', 0):
+                raise RuntimeError(f"{func.__name__} called while iter_all is streaming on this thread; "
+                                   f"the open read would keep the commit waiting until it timed out")
+            waited = 0.0
+            attempt = 0
+            while True:
+                begun = False
+                started = time.monotonic()
+                try:
+                    self.connect()  # Use inherited Database connect method
+                    self.conn.execute('BEGIN IMMEDIATE')
+                    begun = True
+                    waited += time.monotonic() - started
+                    result = func(self, *args, **kwargs)
+                    self.conn.commit()
+                    self.stats.record(waited, attempt)
+                    return result
+                except Exception as e:
+                    if not begun:
+                        waited += time.monotonic() - started
+                    if self.conn is not None and self.conn.in_transaction:
+                        self.conn.rollback()
+                    if is_lock_error(e) and attempt < self.max_retries:
+                        waited += self.backoff(attempt)
+                        attempt += 1
+                        continue
+                    self.stats.record(waited, attempt, failed=is_lock_error(e))
+                    raise Exception(f"Error in {func.__name__} with args {reprlib.repr(args)}, "
+                                    f"kwargs {reprlib.repr(kwargs)}. Original error: {e}") from e
+                finally:
+                    self.close_thread_connection()
         return wrapper
 
-    @transactional
-    def add(self, **fields):
+    def build_insert(self, fields):
+        """Build the INSERT statement and parameters for one record (without executing it)."""
         validate_fields(fields, self.schema)
         columns = ', '.join(fields.keys())
         placeholders = ', '.join('?' for _ in fields)
         query = f"INSERT INTO {self.table} ({columns}, created_at) VALUES ({placeholders}, CURRENT_TIMESTAMP)"
-        self.execute(query, tuple(fields.values()))  # Use inherited execute method
+        return query, tuple(fields.values())
 
-    @transactional
-    def update(self, where, **fields):
+    def build_update(self, where, fields):
+        """Build the UPDATE statement and parameters (without executing it)."""
         validate_fields(fields, self.schema)
         set_clause = ', '.join(f"{k} = ?" for k in fields)
         where_clause = ' AND '.join(f"{k} = ?" for k in where)
         query = f"UPDATE {self.table} SET {set_clause}, updated_at = CURRENT_TIMESTAMP WHERE {where_clause}"
-        self.execute(query, tuple(fields.values()) + tuple(where.values()))
+        return query, tuple(fields.values()) + tuple(where.values())
 
-    @transactional
-    def delete(self, **where):
+    def build_delete(self, where):
+        """Build the DELETE statement and parameters (without executing it)."""
         where_clause = ' AND '.join(f"{k} = ?" for k in where)
         query = f"DELETE FROM {self.table} WHERE {where_clause}"
-        self.execute(query, tuple(where.values()))
+        return query, tuple(where.values())
+
+    @transactional
+    def add(self, **fields):
+        self.execute(*self.build_insert(fields))  # Use inherited execute method
+
+    @transactional
+    def update(self, where, **fields):
+        self.execute(*self.build_update(where, fields))
+
+    @transactional
+    def delete(self, **where):
+        self.execute(*self.build_delete(where))
 
     @transactional
-    def bulk_add(self, records):
+    def bulk_add(self, records, partial=False):
+        """
+        Insert many records with one statement.
+        By default the batch is all-or-nothing and the number of inserted rows is returned.
+        With `partial=True` bad rows are isolated with SAVEPOINTs and bisection: every good row is committed and
+        a dictionary {'inserted': count, 'errors': [{'index', 'record', 'error'}, ...]} is returned.
+        """
         if not records:
-            return 0  # Return 0 if no records are provided
+            return {'inserted': 0, 'errors': []} if partial else 0  # Nothing to insert
 
         first_record = records[0]
         validate_fields(first_record, self.schema)
         columns = ', '.join(first_record.keys())
         placeholders = ', '.join('?' for _ in first_record)
         query = f"INSERT INTO {self.table} ({columns}, created_at) VALUES ({placeholders}, CURRENT_TIMESTAMP)"
+        rows = [tuple(record.values()) for record in records]
+
+        if partial:
+            errors = []
+            inserted = self._insert_isolating_errors(query, rows, 0, len(rows), records, errors)
+            return {'inserted': inserted, 'errors': errors}
 
-        cursor = self.conn.executemany(query, [tuple(record.values()) for record in records])
+        cursor = self.conn.executemany(query, rows)
 
         # Return the number of rows inserted
         return cursor.rowcount
 
+    def _insert_isolating_errors(self, query, rows, start, end, records, errors):
+        """
+        Insert rows[start:end] inside a SAVEPOINT. If the chunk fails it is rolled back and split in two,
+        until the failing rows are isolated one by one. Costs O(bad rows * log(batch size)) extra statements.
+        """
+        self.conn.execute("SAVEPOINT bulk_chunk")
+        try:
+            self.conn.executemany(query, rows[start:end])
+            self.conn.execute("RELEASE bulk_chunk")
+            return end - start
+        except sqlite3.DatabaseError as e:
+            self.conn.execute("ROLLBACK TO bulk_chunk")
+            self.conn.execute("RELEASE bulk_chunk")
+            if end - start == 1:
+                errors.append({'index': start, 'record': records[start], 'error': str(e)})
+                return 0
+        middle = (start + end) // 2
+        return (self._insert_isolating_errors(query, rows, start, middle, records, errors) +
+                self._insert_isolating_errors(query, rows, middle, end, records, errors))
+
     def fetch_one(self, **where):
         """
         Fetch a single record based on the given condition(s).
@@ -78,23 +147,62 @@ class CrudOperations(Database):
         query = f"SELECT * FROM {self.table} WHERE {where_clause} LIMIT 1"
         return self.fetchone(query, tuple(where.values()))
 
-    def fetch_all(self, limit=10, offset=0, **where):
+    def sortable_columns(self):
+        """Columns fetch_all can ORDER BY without a sort: the rowid and the leading column of every index."""
+        columns = {'rowid', 'id'} if 'id' in self.schema else {'rowid'}
+        for index in self.fetchall(f"PRAGMA index_list({self.table})"):
+            info = self.fetchall(f"PRAGMA index_info({index['name']})")
+            if info:
+                columns.add(min(info, key=lambda column: column['seqno'])['name'])
+        return columns
+
+    def query_builder(self):
+        """The `QueryBuilder` for this table, created on first use."""
+        if getattr(self, '_query_builder', None) is None:
+            self._query_builder = QueryBuilder(self.table, self.schema, self.sortable_columns())
+        return self._query_builder
+
+    def fetch_all(self, limit=10, offset=0, columns=None, order_by=None, filters=None, **where):
         """
         Fetch all records that match the given condition(s) with pagination support.
         Args:
             limit: Number of records to return per page.
             offset: The starting point in the records for the current page.
-            where: Optional filtering conditions.
+            columns: Optional list of columns to return instead of all of them.
+            order_by: Optional indexed column (prefix with '-' for descending) or list of them; defaults to rowid.
+            filters: Optional (column, operator, value) tuples, see `QueryBuilder` for the operators.
+            where: Optional equality conditions.
 
         Returns:
             List of dictionaries with pagination.
         """
-        if where:
-            where_clause = ' AND '.join(f"{k} = ?" for k in where)
-            query = f"SELECT * FROM {self.table} WHERE {where_clause} LIMIT ? OFFSET ?"
-            params = tuple(where.values()) + (limit, offset)
-        else:
-            query = f"SELECT * FROM {self.table} LIMIT ? OFFSET ?"
-            params = (limit, offset)
-
+        query, params = self.query_builder().build(
+            self._all_filters(filters, where), columns, order_by, limit, offset)
         return self.fetchall(query, params)
+
+    def iter_all(self, columns=None, order_by=None, filters=None, batch_size=500, **where):
+        """
+        Stream every matching record with `fetchmany`, `batch_size` rows at a time, without loading them all.
+        Yields dictionaries.
+        The stream reads on its own connection, because a write on this instance closes the shared one. Its open
+        read also keeps any commit from finishing, so writing on the same thread while the stream is open raises
+        RuntimeError: collect the ids first, then write.
+        """
+        query, params = self.query_builder().build(self._all_filters(filters, where), columns, order_by)
+        conn = self.open_connection()
+        self._local.streams = getattr(self._local, 'streams', 0) + 1
+        try:
+            cursor = conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                for row in rows:
+                    yield dict(row)
+        finally:
+            self._local.streams -= 1
+            conn.close()
+
+    @staticmethod
+    def _all_filters(filters, where):
+        return list(filters or []) + [(column, 'eq', value) for column, value in where.items()]
@@ -1,15 +1,107 @@
+import random
 import sqlite3
+import threading
+import time
+
+
+def is_lock_error(error):
+    """True for the transient 'database is locked' / 'database is busy' errors worth retrying."""
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in message or 'busy' in message)
+
+
+class LockStats:
+    """Process-wide counters of the time spent waiting for the database write lock."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.waits = 0  # Write transactions started
+            self.wait_seconds = 0.0  # Total time spent acquiring the write lock, backoff included
+            self.max_wait_seconds = 0.0
+            self.retries = 0  # Lock errors that were retried
+            self.failures = 0  # Lock errors that were given up on
+
+    def record(self, seconds, retries=0, failed=False):
+        with self._lock:
+            self.waits += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+            self.retries += retries
+            self.failures += int(failed)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'waits': self.waits,
+                'wait_seconds': self.wait_seconds,
+                'max_wait_seconds': self.max_wait_seconds,
+                'avg_wait_seconds': self.wait_seconds / self.waits if self.waits else 0.0,
+                'retries': self.retries,
+                'failures': self.failures,
+            }
 
 
 class Database:
-    def __init__(self, db_name='phonebook.db'):
+    """
+    Connection handling for one database file.
+
+    Every thread gets its own connection (sqlite3 connections must not be shared between threads); all of them
+    are tracked so `close()` can close them together.
+    Connections wait up to `busy_timeout` seconds for a lock held by another connection or process before
+    SQLite reports "database is locked"; writers that still hit a lock error are retried by
+    `CrudOperations.transactional` up to `max_retries` times with jittered exponential backoff.
+    The class attributes are the process-wide defaults (set from the --busy-timeout / --lock-retries options).
+    """
+    busy_timeout = 5.0
+    max_retries = 5
+    retry_delay = 0.05  # Base delay of the backoff, doubled on every retry
+    stats = LockStats()
+
+    def __init__(self, db_name='phonebook.db', busy_timeout=None):
         self.db_name = db_name
-        self.conn = None
+        if busy_timeout is not None:
+            self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connections = set()  # Open per-thread connections of all threads
+        self._connections_lock = threading.Lock()
+        self.trace = None  # Optional callable receiving every executed SQL statement
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, 'conn', None)
+        return conn if conn in self._connections else None  # None as well once `close()` closed it
+
+    @conn.setter
+    def conn(self, value):
+        self._local.conn = value
+
+    def open_connection(self):
+        """Open a new connection configured like the per-thread one (row factory, busy timeout, trace)."""
+        # 'file:' names are URIs, e.g. a shared in-memory database (see InMemoryContacts)
+        # check_same_thread=False only so `close()` may close it from another thread; it is used by one thread
+        conn = sqlite3.connect(self.db_name, timeout=self.busy_timeout, uri=self.db_name.startswith('file:'),
+                               check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        if self.trace:
+            conn.set_trace_callback(self.trace)
+        return conn
 
     def connect(self):
         if self.conn is None:
-            self.conn = sqlite3.connect(self.db_name)
-            self.conn.row_factory = sqlite3.Row
+            conn = self.open_connection()
+            with self._connections_lock:
+                self._connections.add(conn)
+            self.conn = conn
+
+    def set_trace(self, callback):
+        """Send every SQL statement executed from now on to `callback` (None switches tracing off)."""
+        self.trace = callback
+        if self.conn:
+            self.conn.set_trace_callback(callback)
 
     def execute(self, query, params=None):
         self.connect()
@@ -35,13 +127,40 @@ class Database:
         return dict(result) if result else None
 
     def close(self):
-        if self.conn:
-            self.conn.close()
-            self.conn = None
+        """
+        Close the connections of every thread. Call it once the other threads are done with this object;
+        a thread that uses it again afterwards simply opens a new connection.
+        """
+        with self._connections_lock:
+            connections, self._connections = self._connections, set()
+        for conn in connections:
+            conn.close()
+        self._local.conn = None
+
+    def close_thread_connection(self):
+        """Close only the calling thread's connection, e.g. at the end of a transaction."""
+        conn = self.conn
+        if conn:
+            with self._connections_lock:
+                self._connections.discard(conn)
+            conn.close()
+            self._local.conn = None
 
     def begin_transaction(self):
+        """Start a write transaction, taking the write lock up front (BEGIN IMMEDIATE)."""
         self.connect()
-        self.conn.execute('BEGIN TRANSACTION')
+        self.conn.execute('BEGIN IMMEDIATE')
+
+    def backoff(self, attempt):
+        """Sleep before retry number `attempt` (0-based): full jitter over an exponentially growing window."""
+        delay = random.uniform(0, self.retry_delay * 2 ** attempt)
+        time.sleep(delay)
+        return delay
+
+    @classmethod
+    def lock_stats(cls):
+        """Lock-wait metrics of this process: counts, total / max / average wait and retries."""
+        return cls.stats.snapshot()
 
     def commit(self):
         if self.conn:
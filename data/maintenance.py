@@ -0,0 +1,82 @@
+import sqlite3
+import time
+
+from data.database import Database
+
+AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+
+
+class Maintenance(Database):
+    """
+    Space reclamation and planner statistics for a database file.
+
+    With `auto_vacuum=INCREMENTAL` pages freed by deletes go on the freelist and can be handed back to the
+    file system a few at a time with `PRAGMA incremental_vacuum(N)`. Every step is its own short write
+    transaction, so interactive users are never stalled for longer than one step.
+    """
+
+    def __init__(self, db_name='phonebook.db', step_pages=64, busy_timeout=0.05):
+        # Short busy timeout: maintenance gives way to real users instead of queueing behind them
+        super().__init__(db_name, busy_timeout)
+        self.step_pages = step_pages
+
+    def _pragma(self, name):
+        self.connect()
+        return self.conn.execute(f"PRAGMA {name}").fetchone()[0]
+
+    def auto_vacuum_mode(self):
+        """Return the auto_vacuum mode of the file: 'none', 'full' or 'incremental'."""
+        return AUTO_VACUUM_MODES[self._pragma('auto_vacuum')]
+
+    def enable_incremental_vacuum(self):
+        """
+        One-time migration of an existing file to auto_vacuum=INCREMENTAL.
+        Changing the mode of a file that already has tables needs a full VACUUM, which rewrites the whole file,
+        so run it from the `maintain --migrate` command in a quiet period. Returns True if the file was migrated.
+        """
+        if self.auto_vacuum_mode() == 'incremental':
+            return False
+        self.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self.execute("VACUUM")
+        return True
+
+    def fragmentation(self):
+        """Report page usage; `ratio` is the share of the file taken by free pages."""
+        page_count = self._pragma('page_count')
+        freelist_count = self._pragma('freelist_count')
+        return {
+            'auto_vacuum': self.auto_vacuum_mode(),
+            'page_size': self._pragma('page_size'),
+            'page_count': page_count,
+            'freelist_count': freelist_count,
+            'ratio': freelist_count / page_count if page_count else 0.0,
+        }
+
+    def incremental_vacuum(self, max_seconds=0.05, pause=0.0):
+        """
+        Release free pages in steps of `step_pages` until the freelist is empty or `max_seconds` is used up.
+        Stops early, without raising, when another connection holds the write lock.
+        Returns the number of pages released.
+        """
+        if self.auto_vacuum_mode() != 'incremental':
+            return 0
+        released = 0
+        deadline = time.monotonic() + max_seconds
+        while time.monotonic() < deadline:
+            before = self._pragma('freelist_count')
+            if not before:
+                break
+            try:
+                # The pragma only does its work while the statement is being stepped
+                self.conn.execute(f"PRAGMA incremental_vacuum({self.step_pages})").fetchall()
+            except sqlite3.OperationalError:
+                break  # Database is busy, try again next idle period
+            released += before - self._pragma('freelist_count')
+            if pause:
+                time.sleep(pause)
+        return released
+
+    def optimize(self, analyze=False):
+        """Refresh the query planner statistics: a full ANALYZE, or the cheaper PRAGMA optimize."""
+        self.execute("ANALYZE" if analyze else "PRAGMA optimize")
+        self.commit()
@@ -0,0 +1,88 @@
+def _area_key(row):
+    """SQL expression for the 'area:XXX' stats key of NEW / OLD (or a plain column reference when row is '')."""
+    phone = f"{row}.phone" if row else "phone"
+    return f"'area:' || CASE WHEN {phone} GLOB '([0-9][0-9][0-9])*' THEN substr({phone}, 2, 3) ELSE 'other' END"
+
+
+def _has_email(row):
+    return f"({row}.email IS NOT NULL AND {row}.email <> '')"
+
+
+def _bump(key, delta):
+    return (f"INSERT INTO contacts_stats (key, value) VALUES ({key}, {delta}) "
+            f"ON CONFLICT (key) DO UPDATE SET value = value + excluded.value;")
+
+
+def _drop_empty_area(row):
+    return f"DELETE FROM contacts_stats WHERE key = {_area_key(row)} AND value = 0;"
+
+
+# Recomputes contacts_stats from the contacts table; run inside a write transaction
+CONTACT_STATS_REBUILD = [
+    "DELETE FROM contacts_stats",
+    "INSERT INTO contacts_stats (key, value) SELECT 'total', COUNT(*) FROM contacts",
+    f"INSERT INTO contacts_stats (key, value) SELECT 'with_email', COUNT(*) FROM contacts WHERE {_has_email('contacts')}",
+    f"INSERT INTO contacts_stats (key, value) SELECT {_area_key('')}, COUNT(*) FROM contacts GROUP BY 1",
+]
+
+# Versioned schema migrations, tracked with PRAGMA user_version.
+# Append new migrations at the end with the next version number; never edit one that has shipped.
+MIGRATIONS = [
+    (1, "Index contacts for name, email and timestamp queries", [
+        "CREATE INDEX IF NOT EXISTS idx_contacts_last_name ON contacts (last_name)",
+        "CREATE INDEX IF NOT EXISTS idx_contacts_first_name ON contacts (first_name)",
+        "CREATE INDEX IF NOT EXISTS idx_contacts_email ON contacts (email)",
+        "CREATE INDEX IF NOT EXISTS idx_contacts_created_at ON contacts (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_contacts_updated_at ON contacts (updated_at)",
+    ]),
+    (2, "Trigger-maintained contact counters in contacts_stats", [
+        "CREATE TABLE IF NOT EXISTS contacts_stats (key TEXT PRIMARY KEY, value INTEGER NOT NULL) WITHOUT ROWID",
+        f"""CREATE TRIGGER IF NOT EXISTS contacts_stats_insert AFTER INSERT ON contacts BEGIN
+            {_bump("'total'", 1)}
+            {_bump("'with_email'", _has_email('NEW'))}
+            {_bump(_area_key('NEW'), 1)}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS contacts_stats_delete AFTER DELETE ON contacts BEGIN
+            {_bump("'total'", -1)}
+            {_bump("'with_email'", f"-{_has_email('OLD')}")}
+            {_bump(_area_key('OLD'), -1)}
+            {_drop_empty_area('OLD')}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS contacts_stats_update AFTER UPDATE OF phone, email ON contacts BEGIN
+            {_bump("'with_email'", f"{_has_email('NEW')} - {_has_email('OLD')}")}
+            {_bump(_area_key('OLD'), -1)}
+            {_bump(_area_key('NEW'), 1)}
+            {_drop_empty_area('OLD')}
+        END""",
+    ] + CONTACT_STATS_REBUILD),
+]
+
+
+def schema_version(db):
+    """Return the migration version the database file is at."""
+    return db.fetchone("PRAGMA user_version")['user_version']
+
+
+def migrate(db, migrations=MIGRATIONS):
+    """
+    Apply the pending migrations in order, each in its own transaction together with its version bump.
+    The version is checked again after taking the write lock, so concurrent processes never apply one twice.
+    Returns the list of applied versions.
+    """
+    applied = []
+    for version, description, statements in migrations:
+        if schema_version(db) >= version:
+            continue
+        db.connect()
+        db.conn.execute("BEGIN IMMEDIATE")
+        try:
+            if schema_version(db) < version:
+                for statement in statements:
+                    db.conn.execute(statement)
+                db.conn.execute(f"PRAGMA user_version = {int(version)}")
+                applied.append(version)
+            db.conn.commit()
+        except Exception:
+            db.conn.rollback()
+            raise
+    return applied
@@ -0,0 +1,115 @@
+from functools import lru_cache
+
+# Supported filter operators
+OPERATORS = ('eq', 'in', 'range', 'prefix', 'is_null')
+
+
+class QueryBuilder:
+    """
+    Builds parameterized SELECT statements for one table from filters, a projection and an ORDER BY.
+
+    Filters are (column, operator, value) tuples:
+        ('last_name', 'eq', 'Doe')
+        ('id', 'in', [1, 2, 3])
+        ('created_at', 'range', ('2024-09-01', '2024-10-01'))   # low <= col < high, either bound may be None
+        ('last_name', 'prefix', 'Sm')                            # index-friendly col >= 'Sm' AND col < 'Sn'
+        ('email', 'is_null', True)                               # False means IS NOT NULL
+    Column names are checked against the schema and ORDER BY is limited to indexed columns, so nothing
+    user-supplied reaches the SQL text except through placeholders. The SQL text only depends on the
+    shape of the query, so it is cached here and sqlite3 reuses its prepared statement.
+    """
+
+    def __init__(self, table, schema, sortable_columns):
+        self.table = table
+        self.schema = schema
+        self.sortable_columns = set(sortable_columns)
+
+    def _check_column(self, column):
+        if column not in self.schema and column != 'rowid':
+            raise ValueError(f"Field {column} is not in schema")
+
+    def _normalize_order(self, order_by):
+        """Turn 'col', '-col' or a list of them into ((column, descending), ...) ending with rowid."""
+        if order_by is None:
+            order_by = []
+        elif isinstance(order_by, str):
+            order_by = [order_by]
+        order = []
+        for item in order_by:
+            descending = item.startswith('-')
+            column = item.lstrip('-')
+            self._check_column(column)
+            if column not in self.sortable_columns:
+                raise ValueError(f"Cannot sort on {column}: only indexed columns are sortable "
+                                 f"({', '.join(sorted(self.sortable_columns))})")
+            order.append((column, descending))
+        if not any(column in ('rowid', 'id') for column, _ in order):
+            # Tie-breaker keeps pagination stable; same direction as the last key so an index scan still works
+            order.append(('rowid', order[-1][1] if order else False))
+        return tuple(order)
+
+    def _filter_shape(self, column, operator, value):
+        """Shape of one filter (what the SQL text depends on) plus its parameters."""
+        self._check_column(column)
+        if operator == 'eq':
+            return (column, 'eq'), (value,)
+        if operator == 'in':
+            values = tuple(value)
+            return (column, 'in', len(values)), values
+        if operator == 'range':
+            low, high = value
+            bounds = tuple(bound for bound in (low, high) if bound is not None)
+            return (column, 'range', low is not None, high is not None), bounds
+        if operator == 'prefix':
+            if not value:
+                return None, ()
+            upper = value[:-1] + chr(ord(value[-1]) + 1)
+            return (column, 'prefix'), (value, upper)
+        if operator == 'is_null':
+            return (column, 'is_null', bool(value)), ()
+        raise ValueError(f"Unknown filter operator {operator}, expected one of {', '.join(OPERATORS)}")
+
+    def build(self, filters=(), columns=None, order_by=None, limit=None, offset=0):
+        """Return (sql, params) for the query."""
+        columns = tuple(columns) if columns else None
+        for column in columns or ():
+            self._check_column(column)
+        shapes = []
+        params = []
+        for column, operator, value in filters:
+            shape, values = self._filter_shape(column, operator, value)
+            if shape is not None:
+                shapes.append(shape)
+                params.extend(values)
+        if limit is not None:
+            params.extend((limit, offset))
+        sql = _compile_select(self.table, columns, tuple(shapes), self._normalize_order(order_by), limit is not None)
+        return sql, tuple(params)
+
+
+@lru_cache(maxsize=256)
+def _compile_select(table, columns, shapes, order, paginated):
+    conditions = []
+    for shape in shapes:
+        column, operator = shape[0], shape[1]
+        if operator == 'eq':
+            conditions.append(f"{column} = ?")
+        elif operator == 'in':
+            conditions.append(f"{column} IN ({', '.join('?' for _ in range(shape[2]))})" if shape[2] else "0")
+        elif operator == 'range':
+            if shape[2]:
+                conditions.append(f"{column} >= ?")
+            if shape[3]:
+                conditions.append(f"{column} < ?")
+        elif operator == 'prefix':
+            conditions.append(f"{column} >= ? AND {column} < ?")
+        elif operator == 'is_null':
+            conditions.append(f"{column} IS NULL" if shape[2] else f"{column} IS NOT NULL")
+
+    sql = f"SELECT {', '.join(columns) if columns else '*'} FROM {table}"
+    if conditions:
+        sql += f" WHERE {' AND '.join(conditions)}"
+    sql += " ORDER BY " + ', '.join(f"{column}{' DESC' if descending else ''}" for column, descending in order)
+    if paginated:
+        sql += " LIMIT ? OFFSET ?"
+    return sql
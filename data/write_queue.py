@@ -0,0 +1,167 @@
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from data.crud import CrudOperations
+from data.database import Database
+
+# Journal mode and synchronous setting for each durability level:
+#   'full'   - rollback journal + synchronous=FULL. A future resolves only after its batch is fsynced;
+#              nothing acknowledged is lost, even on power failure. Default. The journal mode is persistent,
+#              so a file left in WAL by an earlier 'normal' run is switched back.
+#   'normal' - WAL + synchronous=NORMAL. Acknowledged writes survive an application crash, but the most
+#              recent batches can be lost (never corrupted) on an OS crash or power failure.
+# Leaving WAL only works while no other connection has the file open: start the writer before them.
+DURABILITY_SETTINGS = {
+    'full': ('delete', 'FULL'),
+    'normal': ('wal', 'NORMAL'),
+}
+
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """
+    Coalesces single-contact writes into group commits.
+
+    Callers enqueue add / update / delete operations and immediately get a `concurrent.futures.Future`.
+    One writer thread drains the queue and commits everything that arrived within `max_delay` seconds
+    (at most `max_batch` operations) in a single transaction, so the cost of the commit and its fsync is
+    shared by the whole batch. Every operation runs inside its own SAVEPOINT: a failing operation only
+    fails its own future, the rest of the batch still commits. Futures resolve after the COMMIT.
+    """
+
+    def __init__(self, db_name='phonebook.db', table='contacts', max_batch=256, max_delay=0.005, durability='full'):
+        if durability not in DURABILITY_SETTINGS:
+            raise ValueError(f"Unknown durability level: {durability}")
+        self.db_name = db_name
+        self.table_name = table
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.durability = durability
+        self.queue = queue.Queue()
+        self.batches = 0
+        self.operations = 0
+        self._ready = threading.Event()
+        self._startup_error = None
+        self._thread = threading.Thread(target=self._run, name='group-commit-writer', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._startup_error:
+            raise self._startup_error
+
+    def _submit(self, op, *args):
+        future = Future()
+        self.queue.put((future, op, args))
+        return future
+
+    def add(self, **fields):
+        """Queue an insert; the future's result is the new row id."""
+        return self._submit('add', fields)
+
+    def update(self, where, **fields):
+        """Queue an update; the future's result is the number of updated rows."""
+        return self._submit('update', where, fields)
+
+    def delete(self, **where):
+        """Queue a delete; the future's result is the number of deleted rows."""
+        return self._submit('delete', where)
+
+    def close(self):
+        """Commit everything still queued and stop the writer thread."""
+        self.queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self):
+        try:
+            # Created on the writer thread: the connection must only ever be used from here
+            self.table = CrudOperations(self.table_name, self.db_name)  # Builds the SQL, validates fields
+            self.table.close()
+            self.conn = sqlite3.connect(self.db_name, timeout=Database.busy_timeout,
+                                        isolation_level=None)  # Transactions are managed by hand
+            self._apply_durability()
+        except Exception as e:
+            self._startup_error = e
+            return
+        finally:
+            self._ready.set()
+
+        stopping = False
+        while not stopping:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = self.queue.get(timeout=timeout) if timeout > 0 else self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+        self.conn.close()
+
+    def _apply_durability(self):
+        """Set the journal mode and synchronous level, failing clearly when the journal mode does not change."""
+        journal_mode, synchronous = DURABILITY_SETTINGS[self.durability]
+        try:
+            mode = self.conn.execute(f"PRAGMA journal_mode = {journal_mode}").fetchone()[0]
+            error = None
+        except sqlite3.OperationalError as e:
+            mode = self.conn.execute("PRAGMA journal_mode").fetchone()[0]
+            error = e
+        if mode.lower() != journal_mode:
+            self.conn.close()
+            raise RuntimeError(f"Could not switch {self.db_name} to the {journal_mode} journal mode needed for "
+                               f"'{self.durability}' durability, it stays in {mode} mode: another connection "
+                               f"has the file open. Start the writer before opening other connections.") from error
+        self.conn.execute(f"PRAGMA synchronous = {synchronous}")
+
+    def _execute(self, op, args):
+        if op == 'add':
+            cursor = self.conn.execute(*self.table.build_insert(*args))
+            return cursor.lastrowid
+        if op == 'update':
+            cursor = self.conn.execute(*self.table.build_update(*args))
+        else:
+            cursor = self.conn.execute(*self.table.build_delete(*args))
+        return cursor.rowcount
+
+    def _commit(self, batch):
+        done = []
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+            for future, op, args in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                self.conn.execute("SAVEPOINT op")
+                try:
+                    result = self._execute(op, args)
+                    self.conn.execute("RELEASE op")
+                    done.append((future, result))
+                except Exception as e:
+                    self.conn.execute("ROLLBACK TO op")
+                    self.conn.execute("RELEASE op")
+                    future.set_exception(e)
+            self.conn.execute("COMMIT")
+        except Exception as e:
+            if self.conn.in_transaction:
+                self.conn.execute("ROLLBACK")
+            for future, op, args in batch:
+                if not future.done():
+                    if future.running() or future.set_running_or_notify_cancel():
+                        future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.operations += len(done)
+        for future, result in done:
+            future.set_result(result)
@@ -1,4 +1,22 @@
+import argparse
+import csv
+import json
+import random
+import sys
+import time
+from concurrent.futures import Future
+
+from app.models.change_log import DEFAULT_MAX_ROWS
+from app.models.contact import Contacts
+from app.models.memory_contacts import InMemoryContacts
+from app.models.sharded_contacts import ShardedContacts
+from app.services.dedup_service import DedupService
+from app.services.diagnostics_service import DiagnosticsService
 from app.services.phonebook_service import PhoneBookService
+from data.backup import BackupManager
+from data.bulk_load import BulkLoader
+from data.database import Database
+from data.write_queue import GroupCommitWriter
 from utils.utils import error_reporter
 from utils.logger import setup_logger
 
@@ -20,15 +38,398 @@ def main_menu():
     print("8. Exit")
     return input("Choose an option: ")
 
+def parse_args(argv=None):
+    """Parse the command line options."""
+    parser = argparse.ArgumentParser(description="Phone Book Manager")
+    parser.add_argument('--db', default='phonebook.db', help="Path to the SQLite database file")
+    parser.add_argument('--shards', type=int, default=0,
+                        help="Partition contacts across this many SQLite files (0 = single file)")
+    parser.add_argument('--shard-by', choices=['hash', 'area_code'], default='hash',
+                        help="How phone numbers are assigned to shards")
+    parser.add_argument('--group-commit', action='store_true',
+                        help="Coalesce single-contact writes into group commits on a writer thread")
+    parser.add_argument('--max-batch', type=int, default=256, help="Group commit: most writes per transaction")
+    parser.add_argument('--max-delay-ms', type=float, default=5.0,
+                        help="Group commit: longest a write waits for others to join its transaction")
+    parser.add_argument('--durability', choices=['full', 'normal'], default='full',
+                        help="Group commit: 'full' fsyncs every commit, 'normal' uses WAL and may lose the "
+                             "last commits on power failure")
+    parser.add_argument('--in-memory', action='store_true',
+                        help="Load the database into memory at startup and serve every read from the copy")
+    parser.add_argument('--write-mode', choices=['through', 'async'], default='through',
+                        help="In-memory: 'through' writes to disk synchronously, 'async' flushes periodically")
+    parser.add_argument('--flush-interval', type=float, default=5.0,
+                        help="In-memory async mode: seconds between flushes of the copy to disk")
+    parser.add_argument('--phone-filter', action='store_true',
+                        help="Answer lookups of unknown phone numbers from a Bloom filter instead of the database")
+    parser.add_argument('--filter-error-rate', type=float, default=0.001,
+                        help="Phone filter: target false-positive rate (lower costs more memory)")
+    parser.add_argument('--change-log-rows', type=int, default=DEFAULT_MAX_ROWS,
+                        help="Changes kept in the change log; older ones are compacted away in idle time")
+    parser.add_argument('--busy-timeout', type=float, default=Database.busy_timeout,
+                        help="Seconds to wait for a lock held by another user before retrying")
+    parser.add_argument('--lock-retries', type=int, default=Database.max_retries,
+                        help="Times a write is retried after a 'database is locked' error")
+    commands = parser.add_subparsers(dest='command')
+
+    backup_parser = commands.add_parser('backup', help="Take an online snapshot of the database")
+    backup_parser.add_argument('destination', help="Snapshot file to write (use a .gz name with --compress)")
+    backup_parser.add_argument('--compress', action='store_true', help="gzip the snapshot")
+    backup_parser.add_argument('--no-verify', action='store_true', help="Skip the integrity check")
+    backup_parser.add_argument('--pages', type=int, default=256, help="Pages copied per step")
+    backup_parser.add_argument('--throttle', type=float, default=0.0, help="Seconds to pause between steps")
+
+    restore_parser = commands.add_parser('restore', help="Restore the database from a snapshot")
+    restore_parser.add_argument('snapshot', help="Snapshot file (plain or .gz)")
+    restore_parser.add_argument('--no-verify', action='store_true', help="Skip the integrity check")
+
+    changes_parser = commands.add_parser('changes', help="Stream contact changes after a sequence number as JSON lines")
+    changes_parser.add_argument('--since', type=int, default=0, help="Last sequence number already applied")
+    changes_parser.add_argument('--batch-size', type=int, default=500, help="Changes read per query")
+
+    compact_parser = commands.add_parser('compact-changes', help="Bound the size of the change log")
+    compact_parser.add_argument('--keep', type=int, default=DEFAULT_MAX_ROWS, help="Number of newest changes to keep")
+
+    maintain_parser = commands.add_parser('maintain', help="Reclaim free space and refresh planner statistics")
+    maintain_parser.add_argument('--migrate', action='store_true',
+                                 help="One-time switch of an existing file to auto_vacuum=INCREMENTAL (runs VACUUM)")
+    maintain_parser.add_argument('--vacuum-seconds', type=float, default=1.0,
+                                 help="Time budget for incremental vacuum steps")
+    maintain_parser.add_argument('--analyze', action='store_true', help="Run a full ANALYZE instead of PRAGMA optimize")
+
+    dedup_parser = commands.add_parser('dedup', help="Find near-duplicate contacts and merge approved proposals")
+    dedup_parser.add_argument('proposals', help="JSON file the proposals are written to (or read from with --apply)")
+    dedup_parser.add_argument('--apply', action='store_true', help="Apply the approved proposals in the file")
+    dedup_parser.add_argument('--threshold', type=float, default=0.85, help="Minimum pair score to propose a merge")
+
+    feed_parser = commands.add_parser('feed', help="Apply a stream of JSON write operations through group commit")
+    feed_parser.add_argument('file', nargs='?', default='-',
+                             help='JSON lines such as {"op": "add", "fields": {...}} ("-" reads stdin)')
+
+    load_parser = commands.add_parser('bulk-load', help="Offline initial load of a new database from a CSV master file")
+    load_parser.add_argument('file', help="CSV file with first_name,last_name,phone[,email,address] columns")
+    load_parser.add_argument('--batch-size', type=int, default=100000, help="Rows per transaction")
+    load_parser.add_argument('--presorted', action='store_true', help="The file is already sorted by phone")
+
+    commands.add_parser('diagnose', help="Check the query plans of every contacts query for scans and sorts")
+
+    commands.add_parser('rebuild-stats', help="Recompute the trigger-maintained contact counters and report drift")
+
+    filter_parser = commands.add_parser('phone-filter', help="Build or load the phone Bloom filter and report on it")
+    filter_parser.add_argument('--rebuild', action='store_true',
+                               help="Rebuild from the table even if the sidecar file is up to date")
+    filter_parser.add_argument('--capacity', type=int, help="Numbers the filter is sized for (default: 2x contacts)")
+
+    bench_parser = commands.add_parser('memory-bench',
+                                       help="Report the in-memory load time and footprint and compare lookup latency")
+    bench_parser.add_argument('--lookups', type=int, default=2000, help="find_by_phone calls per backend (half misses)")
+    return parser.parse_args(argv)
+
+
+def print_progress(copied, total):
+    """Print backup progress on a single line."""
+    print(f"\rCopied {copied}/{total} pages", end='', flush=True)
+
+
+def require_single_file(args):
+    """Refuse commands that work on the --db file itself when --shards would put the contacts elsewhere."""
+    if args.shards:
+        raise ValueError(f"The {args.command} command works on a single database file and does not support "
+                         f"--shards; run it with --db on each shard file instead")
+
+
+@error_reporter
+def run_backup(args):
+    """Handle the `backup` command."""
+    require_single_file(args)
+    manager = BackupManager(args.db, pages=args.pages, throttle=args.throttle, progress=print_progress)
+    summary = manager.backup(args.destination, verify=not args.no_verify, compress=args.compress)
+    print(f"\nBackup written to {summary['destination']} ({summary['size']} bytes, {summary['seconds']:.2f}s)")
+    app_logger.info(f"Backup completed: {summary}")
+
+
+@error_reporter
+def run_restore(args):
+    """Handle the `restore` command."""
+    require_single_file(args)
+    BackupManager(args.db, progress=print_progress).restore(args.snapshot, verify=not args.no_verify)
+    print(f"\nDatabase {args.db} restored from {args.snapshot}")
+    app_logger.info(f"Database {args.db} restored from {args.snapshot}")
+
+
+def build_writer(args):
+    """Create the group-commit writer when it was enabled on the command line."""
+    if not args.group_commit and args.command != 'feed':
+        return None
+    if args.shards or args.in_memory:
+        raise ValueError("Group commit works on a single database file, not on shards or an in-memory copy")
+    Contacts(args.db).close()  # Creates the table, then lets the writer have the file to itself (journal mode)
+    return GroupCommitWriter(args.db, max_batch=args.max_batch, max_delay=args.max_delay_ms / 1000,
+                             durability=args.durability)
+
+
+def build_contacts(args):
+    """Create the contacts backend selected on the command line."""
+    if args.phone_filter and (args.shards or args.in_memory):
+        raise ValueError("The phone filter works on a single database file, not on shards or an in-memory copy")
+    if args.shards:
+        return ShardedContacts(args.db, shards=args.shards, shard_by=args.shard_by)
+    if args.in_memory:
+        return InMemoryContacts(args.db, write_mode=args.write_mode, flush_interval=args.flush_interval)
+    contacts = Contacts(args.db)
+    if args.phone_filter:
+        contacts.enable_phone_filter(error_rate=args.filter_error_rate)
+    return contacts
+
+
+@error_reporter
+def run_changes(args):
+    """Handle the `changes` command: one JSON object per change, oldest first."""
+    require_single_file(args)
+    change_log = Contacts(args.db).change_log
+    for batch in change_log.changes_since(args.since, batch_size=args.batch_size):
+        for change in batch:
+            print(json.dumps(change))
+    change_log.close()
+
+
 @error_reporter
-def main():
+def run_compact_changes(args):
+    """Handle the `compact-changes` command."""
+    require_single_file(args)
+    change_log = Contacts(args.db).change_log
+    deleted = change_log.compact(max_rows=args.keep)
+    change_log.close()
+    print(f"Removed {deleted} old changes from the change log.")
+    app_logger.info(f"Compacted change log: removed {deleted} changes, kept at most {args.keep}")
+
+
+@error_reporter
+def run_maintain(args):
+    """Handle the `maintain` command."""
+    service = PhoneBookService(build_contacts(args))
+    service.display_maintenance_report()
+    for maintenance in service.maintenance:
+        if args.migrate and maintenance.enable_incremental_vacuum():
+            print(f"Migrated {maintenance.db_name} to auto_vacuum=INCREMENTAL.")
+        released = maintenance.incremental_vacuum(max_seconds=args.vacuum_seconds)
+        maintenance.optimize(analyze=args.analyze)
+        print(f"{maintenance.db_name}: released {released} free pages.")
+        app_logger.info(f"Maintenance of {maintenance.db_name}: released {released} pages")
+    service.display_maintenance_report()
+    service.close()
+
+
+@error_reporter
+def run_dedup(args):
+    """Handle the `dedup` command: write proposals for review, or apply the approved ones."""
+    require_single_file(args)
+    contacts = Contacts(args.db)
+    dedup = DedupService(contacts, threshold=args.threshold)
+    if args.apply:
+        merged = dedup.apply(dedup.load_proposals(args.proposals))
+        print(f"Merged {merged} duplicate contacts.")
+    else:
+        proposals = dedup.find_duplicates()
+        dedup.save_proposals(proposals, args.proposals)
+        print(f"Wrote {len(proposals)} merge proposals to {args.proposals}. "
+              f"Set \"approved\": true on the ones to merge, then run with --apply.")
+    contacts.close()
+
+
+@error_reporter
+def run_feed(args):
+    """
+    Handle the `feed` command: every line is {"op": "add"|"update"|"delete", "fields": {...}, "where": {...}}.
+    All operations are queued without waiting, then one result line is printed per input line.
+    """
+    contacts = Contacts(args.db)  # Make sure the table exists
+    contacts.close()
+    validator = contacts.validator
+    writer = build_writer(args)
+    source = sys.stdin if args.file == '-' else open(args.file, encoding='utf-8')
+    started = time.monotonic()
+    futures = []
+    try:
+        for line in source:
+            if not line.strip():
+                continue
+            operation = json.loads(line)
+            if operation['op'] in ('add', 'update'):
+                fields, errors = validator.validate(operation['fields'], partial=operation['op'] == 'update')
+                if errors:
+                    futures.append(Future())
+                    futures[-1].set_exception(ValueError('; '.join(errors.values())))
+                elif operation['op'] == 'add':
+                    futures.append(writer.add(**fields))
+                else:
+                    futures.append(writer.update(operation['where'], **fields))
+            elif operation['op'] == 'delete':
+                futures.append(writer.delete(**operation['where']))
+            else:
+                raise ValueError(f"Unknown operation: {operation['op']}")
+        failed = 0
+        for n, future in enumerate(futures, start=1):
+            try:
+                print(json.dumps({'line': n, 'ok': True, 'result': future.result()}))
+            except Exception as e:
+                failed += 1
+                print(json.dumps({'line': n, 'ok': False, 'error': str(e)}))
+    finally:
+        # Also on a bad line: whatever was queued is committed and the writer thread stops
+        writer.close()
+        if source is not sys.stdin:
+            source.close()
+    elapsed = time.monotonic() - started
+    app_logger.info(f"Feed applied {len(futures)} operations ({failed} failed) in {writer.batches} commits, "
+                    f"{elapsed:.2f}s")
+
+
+@error_reporter
+def run_diagnose(args):
+    """Handle the `diagnose` command: print every query plan and flag unexpected scans or sorts."""
+    require_single_file(args)
+    diagnostics = DiagnosticsService(args.db)
+    report = diagnostics.diagnose()
+    for entry in report:
+        status = 'OK' if not entry['problems'] else ('EXPECTED' if entry['expected'] else 'PROBLEM')
+        print(f"[{status}] {entry['label']}: {entry['sql']}")
+        for detail in entry['plan']:
+            print(f"    {detail}")
+        if entry['problems'] and entry['expected']:
+            print(f"    accepted: {entry['expected']}")
+    problems = diagnostics.unexpected_problems(report)
+    print(f"\n{len(report)} queries checked, {len(problems)} with unexpected full scans or temp B-trees.")
+    return len(problems)
+
+
+@error_reporter
+def run_bulk_load(args):
+    """Handle the `bulk-load` command."""
+    require_single_file(args)
+    contacts = Contacts(args.db)  # Creates the table, indexes and triggers on a new file
+    contacts.close()
+    loader = BulkLoader(args.db, validator=contacts.validator, batch_size=args.batch_size, presorted=args.presorted,
+                        first_line=2,  # Line 1 of the file is the CSV header
+                        progress=lambda loaded: print(f"\rLoaded {loaded} rows", end='', flush=True))
+    with open(args.file, newline='', encoding='utf-8') as csvfile:
+        records = ({k: v for k, v in row.items() if k in contacts.schema} for row in csv.DictReader(csvfile))
+        summary = loader.load(records)
+    print(f"\nBulk load finished: {summary['loaded']} rows loaded, {len(summary['failed'])} rejected, "
+          f"{summary['total_seconds']:.1f}s in total.")
+    for failure in summary['failed'][:10]:
+        print(f"Line {failure['line']}: {failure['error']}")
+    app_logger.info(f"Bulk load of {args.file}: {summary['loaded']} loaded, {len(summary['failed'])} rejected, "
+                    f"{summary['total_seconds']:.1f}s")
+
+
+@error_reporter
+def run_rebuild_stats(args):
+    """Handle the `rebuild-stats` command."""
+    contacts = build_contacts(args)
+    drift = contacts.rebuild_stats()
+    contacts.close()
+    for key, (old, new) in drift.items():
+        print(f"{key}: {old} -> {new}")
+    print(f"Contact statistics rebuilt, {len(drift)} counters corrected.")
+    app_logger.info(f"Rebuilt contact statistics, corrected drift: {drift}")
+
+
+@error_reporter
+def run_phone_filter(args):
+    """Handle the `phone-filter` command."""
+    require_single_file(args)
+    contacts = Contacts(args.db)
+    built = contacts.enable_phone_filter(error_rate=args.filter_error_rate, capacity=args.capacity)
+    if args.rebuild and not built:
+        contacts.rebuild_phone_filter(capacity=args.capacity)
+        contacts.save_phone_filter()
+        built = True
+    stats = contacts.phone_filter_stats()
+    contacts.close()
+    contacts.change_log.close()
+    print(f"Phone filter {'built from the table' if built else 'loaded'} (sidecar {stats['sidecar']}): "
+          f"{stats['items']} numbers, capacity {stats['capacity']}, {stats['memory_bytes'] / 1024:.0f} KiB, "
+          f"{stats['hashes']} hashes.")
+    print(f"False-positive rate: target {stats['target_error_rate']:.4%}, "
+          f"estimated {stats['estimated_error_rate']:.4%} at {stats['fill_ratio']:.1%} of the bits set.")
+    app_logger.info(f"Phone filter of {args.db}: {stats}")
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+@error_reporter
+def run_memory_bench(args):
+    """Handle the `memory-bench` command."""
+    require_single_file(args)
+    contacts = InMemoryContacts(args.db, write_mode=args.write_mode, flush_interval=args.flush_interval)
+    report = contacts.memory_report()
+    print(f"Cold start: loaded {report['disk_bytes'] / 1024:.0f} KiB from disk in "
+          f"{report['load_seconds'] * 1000:.1f} ms, {report['memory_bytes'] / 1024:.0f} KiB held in memory "
+          f"({report['page_count']} pages).")
+
+    disk = Contacts(args.db)
+    phones = [row['phone'] for row in contacts.fetch_all(limit=args.lookups // 2, columns=['phone'])]
+    phones += [f"(000){i // 10000:03d}-{i % 10000:04d}" for i in range(args.lookups - len(phones))]  # Misses
+    random.shuffle(phones)
+    for label, backend in (('disk', disk), ('memory', contacts)):
+        backend.find_by_phone(phones[0])  # Open the connection outside the measurement
+        latencies = []
+        for phone in phones:
+            started = time.perf_counter()
+            backend.find_by_phone(phone)
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        print(f"{label:>6}: {len(latencies)} lookups, p50 {_percentile(latencies, 0.5) * 1e6:.0f} us, "
+              f"p99 {_percentile(latencies, 0.99) * 1e6:.0f} us, max {latencies[-1] * 1e6:.0f} us")
+    disk.close()
+    disk.change_log.close()
+    contacts.close()
+    app_logger.info(f"In-memory benchmark of {args.db}: {report}")
+
+
+@error_reporter
+def main(argv=None):
     """Main program loop to handle user input and perform actions."""
-    service = PhoneBookService()
+    args = parse_args(argv)
+    Database.busy_timeout = args.busy_timeout
+    Database.max_retries = args.lock_retries
+    if args.command == 'backup':
+        return run_backup(args)
+    if args.command == 'restore':
+        return run_restore(args)
+    if args.command == 'changes':
+        return run_changes(args)
+    if args.command == 'compact-changes':
+        return run_compact_changes(args)
+    if args.command == 'maintain':
+        return run_maintain(args)
+    if args.command == 'dedup':
+        return run_dedup(args)
+    if args.command == 'feed':
+        return run_feed(args)
+    if args.command == 'diagnose':
+        return run_diagnose(args)
+    if args.command == 'bulk-load':
+        return run_bulk_load(args)
+    if args.command == 'rebuild-stats':
+        return run_rebuild_stats(args)
+    if args.command == 'memory-bench':
+        return run_memory_bench(args)
+    if args.command == 'phone-filter':
+        return run_phone_filter(args)
+
+    writer = build_writer(args)  # First: it may have to switch the journal mode, which needs no other connection
+    service = PhoneBookService(build_contacts(args), writer, change_log_rows=args.change_log_rows)
 
     # Display contact summary before showing the menu
     service.display_summary()
 
     while True:
+        # The user is about to read the menu: a good moment for a short, bounded maintenance step
+        service.run_idle_maintenance()
         option = main_menu()
         if option == "1":
             service.handle_add_contact()
@@ -49,6 +450,11 @@ def main():
         elif option == "8":
             print("Exiting Phone Book Manager.")
             app_logger.info("Exited the Phone Book Manager.")
+            app_logger.info(f"Lock waits: {Database.lock_stats()}")
+            if args.phone_filter:
+                service.contacts.save_phone_filter()  # Next start loads it instead of rebuilding
+                app_logger.info(f"Phone filter: {service.contacts.phone_filter_stats()}")
+            service.close()
             break
         else:
             print("Invalid option, please choose a valid menu item.")
@@ -0,0 +1,28 @@
+import os
+import tempfile
+import unittest
+
+from app.models.contact import Contacts
+
+
+class TempDatabaseTestCase(unittest.TestCase):
+    """
+    Runs every test on a throwaway phonebook.db in a temporary directory, never on the committed one.
+    `self.db_name` is its path and `self.contacts` a `Contacts` on it (unless `with_contacts` is False);
+    everything is closed and removed when the test ends.
+    """
+    with_contacts = True
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.db_name = os.path.join(self.tmp_dir.name, 'phonebook.db')
+        if self.with_contacts:
+            self.contacts = self.make_contacts()
+
+    def make_contacts(self):
+        """Open a `Contacts` on the test database that is closed, change log included, when the test ends."""
+        contacts = Contacts(self.db_name)
+        self.addCleanup(contacts.change_log.close)
+        self.addCleanup(contacts.close)
+        return contacts
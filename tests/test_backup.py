@@ -0,0 +1,84 @@
+import os
+import sqlite3
+import unittest
+from unittest.mock import patch
+
+from data.backup import BackupManager
+from tests.base import TempDatabaseTestCase
+
+
+class TestBackupManager(TempDatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.contacts.bulk_add([
+            {'first_name': 'Name', 'last_name': 'Test', 'phone': f'(555)000-{i:04d}'} for i in range(500)
+        ])
+
+    def _count(self, path):
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute("SELECT COUNT(*) FROM contacts").fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_backup_reports_progress_and_restores(self):
+        progress = []
+        manager = BackupManager(self.db_name, pages=1, progress=lambda copied, total: progress.append((copied, total)))
+        snapshot = os.path.join(self.tmp_dir.name, 'snapshot.db')
+        summary = manager.backup(snapshot)
+
+        self.assertTrue(summary['verified'])
+        self.assertEqual(self._count(snapshot), 500)
+        self.assertGreater(len(progress), 1)
+        self.assertEqual(progress[-1][0], progress[-1][1])
+
+        self.contacts.delete(last_name='Test')
+        self.assertEqual(self.contacts.count_contacts(), 0)
+        manager.restore(snapshot)
+        self.assertEqual(self.contacts.count_contacts(), 500)
+
+    def test_copy_restarted_by_writers_finishes_in_one_step(self):
+        writer = sqlite3.connect(self.db_name)
+        writes = iter(range(1000))
+
+        def write_between_steps(copied, total):
+            # Every step is followed by a write, so the step-wise copy never gets further than its first step
+            writer.execute("UPDATE contacts SET address = ? WHERE id = 1", (str(next(writes)),))
+            writer.commit()
+
+        manager = BackupManager(self.db_name, pages=1, progress=write_between_steps, max_restarts=3)
+        snapshot = os.path.join(self.tmp_dir.name, 'snapshot.db')
+        try:
+            manager.backup(snapshot)
+        finally:
+            writer.close()
+
+        self.assertEqual(manager.restarts, 4)
+        self.assertEqual(self._count(snapshot), 500)
+
+    def test_failed_compression_leaves_no_partial_file(self):
+        snapshot = os.path.join(self.tmp_dir.name, 'snapshot.db.gz')
+        with patch('data.backup.shutil.copyfileobj', side_effect=OSError("No space left on device")):
+            with self.assertRaises(OSError):
+                BackupManager(self.db_name).backup(snapshot, compress=True)
+
+        self.assertEqual(sorted(os.listdir(self.tmp_dir.name)), ['phonebook.db'])
+
+    def test_compressed_backup_in_background(self):
+        manager = BackupManager(self.db_name, pages=4)
+        snapshot = os.path.join(self.tmp_dir.name, 'snapshot.db.gz')
+        thread = manager.backup_in_background(snapshot, compress=True)
+        # Writes keep working while the backup runs
+        self.contacts.add(first_name='Late', last_name='Writer', phone='(555)999-0000')
+        thread.join()
+
+        self.assertIsNone(thread.error)
+        self.assertTrue(thread.summary['compressed'])
+        self.contacts.delete(last_name='Test')
+        manager.restore(snapshot)
+        self.assertIn(self.contacts.count_contacts(), (500, 501))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from app.models.contact import Contacts
+from tests.base import TempDatabaseTestCase
+from utils.bloom_filter import BloomFilter
+
+
+class TestBloomFilter(unittest.TestCase):
+
+    def test_no_false_negatives_and_bounded_false_positives(self):
+        bloom = BloomFilter(capacity=5000, error_rate=0.01)
+        for i in range(5000):
+            bloom.add(f'555{i:07d}')
+        count = bloom.count
+        bloom.add('5550000000')  # Already present: not counted twice
+
+        self.assertEqual(bloom.count, count)
+        self.assertGreater(count, 4900)  # Items whose bits were all set already are not counted
+        self.assertTrue(all(f'555{i:07d}' in bloom for i in range(5000)))
+        false_positives = sum(f'777{i:07d}' in bloom for i in range(20000))
+        self.assertLess(false_positives / 20000, 0.02)
+        self.assertAlmostEqual(bloom.estimated_error_rate(), 0.01, delta=0.005)
+
+    def test_save_and_load_round_trip(self):
+        bloom = BloomFilter(capacity=100, error_rate=0.001)
+        bloom.add('1234567890')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'phones.bloom')
+            bloom.save(path, seq=42)
+            loaded, header = BloomFilter.load(path)
+
+        self.assertEqual(header['seq'], 42)
+        self.assertEqual(loaded.bits, bloom.bits)
+        self.assertIn('1234567890', loaded)
+
+
+class TestContactsPhoneFilter(TempDatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.contacts.add(first_name='John', last_name='Doe', phone='(123)456-7890')
+        self.contacts.enable_phone_filter()
+
+    def test_misses_skip_the_database_and_writes_update_the_filter(self):
+        statements = []
+        self.contacts.find_by_phone('(000)000-0000')  # Opens the connection and syncs
+        self.contacts.set_trace(statements.append)
+        self.assertIsNone(self.contacts.find_by_phone('(999)999-9999'))
+        self.assertEqual([sql for sql in statements if 'FROM contacts ' in sql], [])
+
+        self.contacts.add(first_name='Jane', last_name='Doe', phone='(123)555-0000')
+        self.contacts.bulk_add([{'first_name': 'Bob', 'last_name': 'Roe', 'phone': '(456)555-0001'}])
+        self.contacts.update({'phone': '(123)456-7890'}, phone='(999)456-7890')
+        for phone in ('(123)555-0000', '(456)555-0001', '(999)456-7890'):
+            self.assertIsNotNone(self.contacts.find_by_phone(phone))
+        stats = self.contacts.phone_filter_stats()
+        self.assertGreaterEqual(stats['definite_misses'], 2)
+        self.assertEqual(stats['items'], 4)
+
+    def test_writes_from_other_connections_are_picked_up(self):
+        self.contacts.find_by_phone('(000)000-0000')
+        conn = sqlite3.connect(self.db_name)
+        conn.execute("INSERT INTO contacts (first_name, last_name, phone) VALUES ('Ann', 'Lee', '(321)000-1111')")
+        conn.commit()
+        conn.close()
+
+        self.assertEqual(self.contacts.find_by_phone('(321)000-1111')['first_name'], 'Ann')
+
+    def test_sidecar_is_reused_only_while_fresh(self):
+        other = Contacts(self.db_name)
+        self.assertFalse(other.enable_phone_filter())  # Saved at the current sequence and count
+        other.add(first_name='Jane', last_name='Doe', phone='(123)555-0000')
+        other.close()
+        other.change_log.close()
+
+        reopened = Contacts(self.db_name)
+        self.assertTrue(reopened.enable_phone_filter())  # The file changed since the sidecar was saved
+        self.assertIsNotNone(reopened.find_by_phone('(123)555-0000'))
+        reopened.close()
+        reopened.change_log.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import sqlite3
+import unittest
+
+from app.models.contact import Contacts
+from data.bulk_load import BulkLoader
+from tests.base import TempDatabaseTestCase
+
+
+class TestBulkLoader(TempDatabaseTestCase):
+    with_contacts = False
+
+    def setUp(self):
+        super().setUp()
+        contacts = Contacts(self.db_name)
+        self.validator = contacts.validator
+        contacts.close()
+
+    def _schema_objects(self, conn):
+        return conn.execute("SELECT type, name FROM sqlite_master WHERE tbl_name = 'contacts' ORDER BY name").fetchall()
+
+    def test_load_restores_indexes_triggers_and_settings(self):
+        conn = sqlite3.connect(self.db_name)
+        objects_before = self._schema_objects(conn)
+        conn.close()
+
+        records = [{'first_name': 'Name', 'last_name': 'Test', 'phone': f'{9999999999 - i}'} for i in range(5000)]
+        records.append({'first_name': 'Dup', 'last_name': 'Test', 'phone': '9999999999'})
+        records.append({'first_name': 'Bad', 'last_name': 'Test', 'phone': '123'})
+        summary = BulkLoader(self.db_name, validator=self.validator, batch_size=1000).load(records)
+
+        self.assertEqual(summary['loaded'], 5000)
+        self.assertEqual([failure['line'] for failure in summary['failed']], [5001, 5002])
+
+        conn = sqlite3.connect(self.db_name)
+        self.assertEqual(self._schema_objects(conn), objects_before)
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], 'delete')
+        # Presorted load: rowids follow the phone order
+        first = conn.execute("SELECT phone FROM contacts ORDER BY id LIMIT 1").fetchone()[0]
+        self.assertEqual(first, '(999)999-5000')
+        conn.close()
+
+        # The change-log triggers are back and fire again; the counters were rebuilt for the loaded rows
+        contacts = Contacts(self.db_name)
+        self.assertEqual(contacts.count_contacts(), 5000)
+        contacts.add(first_name='After', last_name='Load', phone='(111)111-1111')
+        self.assertEqual(contacts.count_contacts(), 5001)
+        self.assertEqual([change['op'] for batch in contacts.change_log.changes_since(0) for change in batch],
+                         ['insert'])
+        contacts.close()
+        contacts.change_log.close()
+
+    def test_refuses_a_database_in_use(self):
+        conn = sqlite3.connect(self.db_name, isolation_level=None)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            with self.assertRaises(RuntimeError):
+                BulkLoader(self.db_name).load([{'first_name': 'A', 'last_name': 'B', 'phone': '(111)111-1111'}])
+        finally:
+            conn.execute("ROLLBACK")
+            conn.close()
+
+    def test_schema_violations_are_rejected_without_a_validator(self):
+        records = [{'first_name': 'Name', 'last_name': 'Test', 'phone': f'(555)000-000{i}'} for i in range(3)]
+        records.append({'first_name': None, 'last_name': 'Test', 'phone': '(555)000-0009'})
+        records.append({'first_name': 'Name', 'last_name': 'Test', 'phone': '(555)000-0008', 'nickname': 'N'})
+        summary = BulkLoader(self.db_name, batch_size=2, first_line=2).load(records)
+
+        self.assertEqual(summary['loaded'], 3)
+        self.assertEqual([(failure['line'], failure['error']) for failure in summary['failed']],
+                         [(5, 'Missing first_name'), (6, 'Unknown column nickname')])
+
+    def test_failed_insert_releases_the_lock_and_restores_settings(self):
+        loader = BulkLoader(self.db_name)
+        loader._prepare = lambda conn, records: ([(1, {'first_name': None, 'last_name': 'X', 'phone': '1'})], [])
+        with self.assertRaises(RuntimeError) as context:
+            loader.load([])
+        self.assertIsInstance(context.exception.__cause__, sqlite3.IntegrityError)
+
+        conn = sqlite3.connect(self.db_name, timeout=0, isolation_level=None)
+        conn.execute("BEGIN IMMEDIATE")  # Nothing holds the lock any more
+        conn.execute("ROLLBACK")
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], 'delete')
+        indexes = conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL")
+        self.assertGreater(indexes.fetchone()[0], 0)
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
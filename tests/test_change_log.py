@@ -0,0 +1,66 @@
+import unittest
+
+from tests.base import TempDatabaseTestCase
+
+
+class TestChangeLog(TempDatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.change_log = self.contacts.change_log
+
+    def _all_changes(self, since=0, batch_size=500):
+        return [change for batch in self.change_log.changes_since(since, batch_size) for change in batch]
+
+    def test_triggers_record_inserts_updates_and_deletes(self):
+        self.contacts.add(first_name='John', last_name='Doe', phone='(123)456-7890')
+        contact = self.contacts.find_by_phone('(123)456-7890')
+        self.contacts.update_contact_by_phone('(123)456-7890', email='john@example.com')
+        self.contacts.delete(id=contact['id'])
+
+        changes = self._all_changes()
+        self.assertEqual([change['op'] for change in changes], ['insert', 'update', 'delete'])
+        self.assertTrue(all(change['contact_id'] == contact['id'] for change in changes))
+        self.assertIn('email', changes[1]['changed_columns'].split(','))
+        self.assertNotIn('first_name', changes[1]['changed_columns'].split(','))
+        self.assertEqual([change['seq'] for change in changes], sorted(change['seq'] for change in changes))
+
+    def test_changes_since_streams_in_batches(self):
+        self.contacts.bulk_add([
+            {'first_name': 'Name', 'last_name': 'Test', 'phone': f'(555)000-{i:04d}'} for i in range(25)
+        ])
+        batches = list(self.change_log.changes_since(10, batch_size=10))
+        self.assertEqual([len(batch) for batch in batches], [10, 5])
+        self.assertEqual(batches[0][0]['seq'], 11)
+        self.assertEqual(self.change_log.latest_seq(), 25)
+
+    def test_compaction_bounds_the_log(self):
+        self.contacts.bulk_add([
+            {'first_name': 'Name', 'last_name': 'Test', 'phone': f'(555)000-{i:04d}'} for i in range(25)
+        ])
+        self.assertEqual(self.change_log.compact(max_rows=5), 20)
+        self.assertEqual(len(self._all_changes(since=20)), 5)
+        with self.assertRaises(ValueError):
+            self._all_changes(since=3)
+
+    def test_compact_if_needed_only_compacts_a_log_over_its_bound(self):
+        self.contacts.bulk_add([
+            {'first_name': 'Name', 'last_name': 'Test', 'phone': f'(555)000-{i:04d}'} for i in range(25)
+        ])
+        self.assertEqual(self.change_log.compact_if_needed(max_rows=25), 0)
+        self.assertEqual(self.change_log.compact_if_needed(max_rows=10), 15)
+        self.assertEqual(self.change_log.size(), 10)
+
+    def test_compaction_between_batches_is_reported(self):
+        self.contacts.bulk_add([
+            {'first_name': 'Name', 'last_name': 'Test', 'phone': f'(555)000-{i:04d}'} for i in range(25)
+        ])
+        batches = self.change_log.changes_since(0, batch_size=10)
+        self.assertEqual(next(batches)[-1]['seq'], 10)
+        self.change_log.compact(max_rows=5)  # Deletes 11-20 before the reader got to them
+        with self.assertRaises(ValueError):
+            next(batches)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import multiprocessing
+import sqlite3
+import threading
+import unittest
+
+from app.models.contact import Contacts
+from data.database import Database
+from tests.base import TempDatabaseTestCase
+
+PROCESSES = 4
+WRITES_PER_PROCESS = 50
+
+
+def add_contacts(db_name, worker):
+    contacts = Contacts(db_name)
+    for i in range(WRITES_PER_PROCESS):
+        contacts.add(first_name='Worker', last_name=f'Number{worker}', phone=f'({worker:03d})000-{i:04d}')
+        if i % 10 == 0:
+            contacts.update({'phone': f'({worker:03d})000-{i:04d}'}, email=f'w{worker}@example.com')
+    contacts.close()
+
+
+class TestConcurrentAccess(TempDatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        Database.stats.reset()
+
+    def test_no_lost_writes_across_processes(self):
+        # Fresh interpreters: an SQLite connection must not be carried across fork()
+        context = multiprocessing.get_context('spawn')
+        workers = [context.Process(target=add_contacts, args=(self.db_name, worker)) for worker in range(PROCESSES)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=120)
+
+        self.assertEqual([worker.exitcode for worker in workers], [0] * PROCESSES)
+        self.assertEqual(self.contacts.count_contacts(), PROCESSES * WRITES_PER_PROCESS)
+        with_email = self.contacts.fetchone("SELECT COUNT(*) AS n FROM contacts WHERE email IS NOT NULL")['n']
+        self.assertEqual(with_email, PROCESSES * WRITES_PER_PROCESS // 10)
+
+    def test_threads_share_one_instance_with_their_own_connections(self):
+        errors = []
+
+        def work(worker):
+            try:
+                for i in range(20):
+                    self.contacts.add(first_name='Thread', last_name='Worker', phone=f'({worker:03d})111-{i:04d}')
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=work, args=(worker,)) for worker in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(self.contacts.count_contacts(), 80)
+        self.assertEqual(Database.lock_stats()['waits'], 80)
+
+    def test_close_closes_the_connections_of_every_thread(self):
+        connections = []
+
+        def read():
+            self.contacts.count_contacts()
+            connections.append(self.contacts.conn)
+
+        threads = [threading.Thread(target=read) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.contacts.close()
+
+        self.assertEqual(len(set(map(id, connections))), 3)
+        for conn in connections:
+            with self.assertRaises(sqlite3.ProgrammingError):
+                conn.execute("SELECT 1")
+        # A thread that uses the instance again gets a new connection
+        self.assertEqual(self.contacts.count_contacts(), 0)
+
+    def test_lock_errors_are_retried_and_wait_is_recorded(self):
+        contacts = Contacts(self.db_name)
+        contacts.busy_timeout = 0.01  # Give up on the busy handler quickly so the retry path is taken
+        contacts.retry_delay = 0.05
+        contacts.max_retries = 20
+        contacts.close()  # Reconnect with the short timeout
+        blocker = sqlite3.connect(self.db_name, isolation_level=None, check_same_thread=False)
+        blocker.execute("BEGIN IMMEDIATE")
+        release = threading.Timer(0.2, blocker.execute, args=("COMMIT",))
+        release.start()
+        try:
+            contacts.add(first_name='John', last_name='Doe', phone='(123)456-7890')
+        finally:
+            release.join()
+            blocker.close()
+            contacts.close()
+            contacts.change_log.close()
+
+        stats = Database.lock_stats()
+        self.assertEqual(self.contacts.count_contacts(), 1)
+        self.assertGreater(stats['retries'], 0)
+        self.assertEqual(stats['failures'], 0)
+        self.assertGreaterEqual(stats['max_wait_seconds'], 0.1)
+
+    def test_lock_error_is_reported_after_the_last_retry(self):
+        contacts = Contacts(self.db_name)
+        contacts.busy_timeout = 0.01
+        contacts.retry_delay = 0.001
+        contacts.max_retries = 2
+        contacts.close()
+        blocker = sqlite3.connect(self.db_name, isolation_level=None)
+        blocker.execute("BEGIN IMMEDIATE")
+        try:
+            with self.assertRaises(Exception) as context:
+                contacts.add(first_name='John', last_name='Doe', phone='(123)456-7890')
+        finally:
+            blocker.execute("ROLLBACK")
+            blocker.close()
+            contacts.close()
+            contacts.change_log.close()
+
+        self.assertIsInstance(context.exception.__cause__, sqlite3.OperationalError)
+        self.assertEqual(Database.lock_stats()['retries'], 2)
+        self.assertEqual(Database.lock_stats()['failures'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
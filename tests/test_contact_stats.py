@@ -0,0 +1,34 @@
+import unittest
+
+from tests.base import TempDatabaseTestCase
+
+
+class TestContactStats(TempDatabaseTestCase):
+
+    def test_counters_follow_inserts_updates_and_deletes(self):
+        self.contacts.add(first_name='John', last_name='Doe', phone='(123)456-7890', email='john@example.com')
+        self.contacts.add(first_name='Jane', last_name='Doe', phone='(123)555-0000')
+        self.contacts.bulk_add([{'first_name': 'Bob', 'last_name': 'Roe', 'phone': '(456)555-0001'}])
+        self.assertEqual(self.contacts.contact_stats(),
+                         {'total': 3, 'with_email': 1, 'area_codes': {'123': 2, '456': 1}})
+
+        self.contacts.update_contact_by_phone('(123)555-0000', email='jane@example.com')
+        self.contacts.update({'phone': '(456)555-0001'}, phone='(789)555-0001')
+        self.contacts.delete(phone='(123)456-7890')
+        self.assertEqual(self.contacts.contact_stats(),
+                         {'total': 2, 'with_email': 1, 'area_codes': {'123': 1, '789': 1}})
+        self.assertEqual(self.contacts.count_contacts(), 2)
+        self.assertEqual(self.contacts.rebuild_stats(), {})
+
+    def test_rebuild_corrects_drift(self):
+        self.contacts.add(first_name='John', last_name='Doe', phone='(123)456-7890')
+        self.contacts.execute("UPDATE contacts_stats SET value = 7 WHERE key = 'total'")
+        self.contacts.execute("DELETE FROM contacts_stats WHERE key = 'area:123'")
+        self.contacts.commit()
+
+        self.assertEqual(self.contacts.rebuild_stats(), {'area:123': (0, 1), 'total': (7, 1)})
+        self.assertEqual(self.contacts.count_contacts(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+
+from tests.base import TempDatabaseTestCase
+
+
+class TestCrudOperations(TempDatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.records = [
+            {'first_name': 'Name', 'last_name': 'Test', 'phone': f'(555)000-{i:04d}'} for i in range(1000)
+        ]
+        # Two bad rows: a duplicate of an earlier phone and a missing NOT NULL value
+        self.records[400] = {'first_name': 'Dup', 'last_name': 'Test', 'phone': '(555)000-0010'}
+        self.records[777] = {'first_name': None, 'last_name': 'Test', 'phone': '(555)999-9999'}
+
+    def test_bulk_add_is_all_or_nothing_by_default(self):
+        with self.assertRaises(Exception) as context:
+            self.contacts.bulk_add(self.records)
+        self.assertEqual(self.contacts.count_contacts(), 0)
+        # The message summarizes the arguments instead of embedding the whole batch
+        self.assertLess(len(str(context.exception)), 1000)
+        self.assertIsNotNone(context.exception.__cause__)
+
+    def test_bulk_add_partial_commits_good_rows_and_reports_bad_ones(self):
+        result = self.contacts.bulk_add(self.records, partial=True)
+
+        self.assertEqual(result['inserted'], 998)
+        self.assertEqual([error['index'] for error in result['errors']], [400, 777])
+        self.assertIn('UNIQUE', result['errors'][0]['error'])
+        self.assertIs(result['errors'][1]['record'], self.records[777])
+        self.assertEqual(self.contacts.count_contacts(), 998)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+from app.services.dedup_service import DedupService
+from tests.base import TempDatabaseTestCase
+
+
+class TestDedupService(TempDatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.contacts.bulk_add([
+            {'first_name': 'John', 'last_name': 'Doe', 'phone': '(123)456-7890', 'email': 'john@example.com',
+             'address': None},
+            {'first_name': 'Jane', 'last_name': 'Smith', 'phone': '(987)654-3210', 'email': None,
+             'address': '456 Oak St'},
+            {'first_name': 'john', 'last_name': 'Doe', 'phone': '1234567890', 'email': 'JOHN@example.com',
+             'address': '123 Maple St'},
+            {'first_name': 'Jane', 'last_name': 'Smith', 'phone': '(987)654-3211', 'email': 'jane@example.com',
+             'address': None},
+            {'first_name': 'Bob', 'last_name': 'Williams', 'phone': '(556)677-8899', 'email': None,
+             'address': None},
+        ])
+        self.dedup = DedupService(self.contacts)
+
+    def test_find_duplicates_groups_near_duplicates(self):
+        proposals = self.dedup.find_duplicates()
+        clusters = sorted([proposal['survivor_id']] + proposal['duplicate_ids'] for proposal in proposals)
+        self.assertEqual(clusters, [[1, 3], [2, 4]])
+        self.assertFalse(any(proposal['approved'] for proposal in proposals))
+
+    def test_chained_matches_only_merge_contacts_similar_to_the_survivor(self):
+        # 6 and 7 match, 7 and 8 match, but 6 and 8 are two digits apart
+        self.contacts.bulk_add([
+            {'first_name': 'Carl', 'last_name': 'Chain', 'phone': f'(444)555-{suffix}', 'email': None,
+             'address': None} for suffix in ('6600', '6609', '6699')
+        ])
+        dedup = DedupService(self.contacts, threshold=0.95)
+        self.assertLess(dedup.score(*[('carl chain', '', digits) for digits in ('4445556600', '4445556699')]), 0.95)
+
+        proposals = [proposal for proposal in dedup.find_duplicates() if proposal['survivor_id'] >= 6]
+        self.assertEqual([(proposal['survivor_id'], proposal['duplicate_ids']) for proposal in proposals], [(6, [7])])
+
+    def test_apply_merges_only_approved_proposals(self):
+        proposals = self.dedup.find_duplicates()
+        for proposal in proposals:
+            proposal['approved'] = proposal['survivor_id'] == 1
+
+        self.assertEqual(self.dedup.apply(proposals), 1)
+        self.assertEqual(self.contacts.count_contacts(), 4)
+        survivor = self.contacts.fetch_one(id=1)
+        self.assertEqual(survivor['address'], '123 Maple St')
+        self.assertIsNotNone(self.contacts.fetch_one(id=4))
+
+
+if __name__ == '__main__':
+    unittest.main()
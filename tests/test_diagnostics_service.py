@@ -0,0 +1,28 @@
+import unittest
+
+from app.services.diagnostics_service import DiagnosticsService, QUERY_SHAPES
+from tests.base import TempDatabaseTestCase
+
+
+class TestDiagnosticsService(TempDatabaseTestCase):
+    with_contacts = False
+
+    def setUp(self):
+        super().setUp()
+        self.report = DiagnosticsService(self.db_name).diagnose()
+
+    def test_every_query_shape_is_captured(self):
+        self.assertEqual({entry['label'] for entry in self.report}, {label for label, _ in QUERY_SHAPES})
+
+    def test_no_unexpected_full_scans_or_temp_btrees(self):
+        # A new query shape that falls back to a table scan or a sort fails here until it gets an index
+        problems = DiagnosticsService.unexpected_problems(self.report)
+        self.assertEqual([(entry['label'], entry['plan']) for entry in problems], [])
+
+    def test_listings_need_no_sort(self):
+        for entry in self.report:
+            self.assertFalse(any('TEMP B-TREE' in detail for detail in entry['plan']), entry['label'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import sqlite3
+import unittest
+
+from app.models.contact import Contacts
+from data.maintenance import Maintenance
+from tests.base import TempDatabaseTestCase
+
+
+class TestMaintenance(TempDatabaseTestCase):
+    with_contacts = False
+
+    def _fill_and_delete(self, contacts):
+        contacts.bulk_add([
+            {'first_name': 'Name', 'last_name': 'Test', 'phone': f'(555)000-{i:04d}', 'address': 'x' * 200}
+            for i in range(2000)
+        ])
+        contacts.delete(last_name='Test')
+
+    def test_new_files_use_incremental_vacuum(self):
+        contacts = Contacts(self.db_name)
+        self._fill_and_delete(contacts)
+        contacts.close()
+
+        maintenance = Maintenance(self.db_name, step_pages=8)
+        before = maintenance.fragmentation()
+        self.assertEqual(before['auto_vacuum'], 'incremental')
+        self.assertGreater(before['ratio'], 0.5)
+
+        released = maintenance.incremental_vacuum(max_seconds=5)
+        after = maintenance.fragmentation()
+        self.assertEqual(released, before['freelist_count'])
+        self.assertEqual(after['freelist_count'], 0)
+        maintenance.close()
+
+    def test_migrates_existing_file(self):
+        conn = sqlite3.connect(self.db_name)
+        conn.execute("CREATE TABLE legacy (id INTEGER PRIMARY KEY)")
+        conn.close()
+
+        maintenance = Maintenance(self.db_name)
+        self.assertEqual(maintenance.auto_vacuum_mode(), 'none')
+        self.assertEqual(maintenance.incremental_vacuum(), 0)
+        self.assertTrue(maintenance.enable_incremental_vacuum())
+        self.assertEqual(maintenance.auto_vacuum_mode(), 'incremental')
+        self.assertFalse(maintenance.enable_incremental_vacuum())
+        maintenance.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import sqlite3
+import threading
+import time
+import unittest
+
+from app.models.contact import Contacts
+from app.models.memory_contacts import InMemoryContacts
+from tests.base import TempDatabaseTestCase
+
+
+class TestInMemoryContacts(TempDatabaseTestCase):
+    with_contacts = False
+
+    def setUp(self):
+        super().setUp()
+        contacts = Contacts(self.db_name)
+        contacts.add(first_name='John', last_name='Doe', phone='(123)456-7890')
+        contacts.close()
+        contacts.change_log.close()
+
+    def _disk_phones(self):
+        conn = sqlite3.connect(self.db_name)
+        try:
+            return [row[0] for row in conn.execute("SELECT phone FROM contacts ORDER BY id")]
+        finally:
+            conn.close()
+
+    def test_reads_are_served_from_the_loaded_copy(self):
+        contacts = InMemoryContacts(self.db_name)
+        conn = sqlite3.connect(self.db_name)
+        conn.execute("DELETE FROM contacts")
+        conn.commit()
+        conn.close()
+
+        self.assertEqual(contacts.find_by_phone('(123)456-7890')['first_name'], 'John')
+        self.assertEqual(contacts.count_contacts(), 1)
+        report = contacts.memory_report()
+        self.assertEqual(report['memory_bytes'], report['page_size'] * report['page_count'])
+        self.assertGreater(report['memory_bytes'], 0)
+        contacts.close()
+
+    def test_write_through_keeps_disk_and_memory_identical(self):
+        contacts = InMemoryContacts(self.db_name)
+        contacts.add(first_name='Jane', last_name='Doe', phone='(123)555-0000')
+        contacts.update({'phone': '(123)456-7890'}, phone='(999)456-7890')
+
+        self.assertEqual(self._disk_phones(), ['(999)456-7890', '(123)555-0000'])
+        self.assertEqual([row['phone'] for row in contacts.fetch_all()], self._disk_phones())
+        self.assertEqual(contacts.find_by_phone('(123)555-0000')['id'], 2)
+        contacts.close()
+
+    def test_write_through_copies_the_ids_the_file_assigned(self):
+        contacts = InMemoryContacts(self.db_name)
+        other = sqlite3.connect(self.db_name)  # Another process writing to the same file
+        other.execute("INSERT INTO contacts (first_name, last_name, phone) VALUES ('Ann', 'Other', '(222)000-0000')")
+        other.commit()
+        other.close()
+
+        contacts.add(first_name='Jane', last_name='Doe', phone='(123)555-0000')
+        self.assertEqual(contacts.find_by_phone('(222)000-0000')['id'], 2)
+        self.assertEqual(contacts.find_by_phone('(123)555-0000')['id'], 3)
+        contacts.update_contact_by_id(3, email='jane@example.com')
+        contacts.delete(id=2)
+
+        conn = sqlite3.connect(self.db_name)
+        disk_rows = conn.execute("SELECT id, phone, email FROM contacts ORDER BY id").fetchall()
+        conn.close()
+        memory_rows = [(row['id'], row['phone'], row['email']) for row in contacts.fetch_all(order_by='id')]
+        self.assertEqual(memory_rows, disk_rows)
+        self.assertEqual(contacts.count_contacts(), 2)
+        contacts.close()
+
+    def test_async_writes_reach_disk_on_flush(self):
+        contacts = InMemoryContacts(self.db_name, write_mode='async', flush_interval=60)
+        contacts.add(first_name='Jane', last_name='Doe', phone='(123)555-0000')
+        self.assertEqual(self._disk_phones(), ['(123)456-7890'])
+
+        self.assertTrue(contacts.flush())
+        self.assertFalse(contacts.flush())  # Nothing changed since
+        self.assertEqual(self._disk_phones(), ['(123)456-7890', '(123)555-0000'])
+
+        contacts.delete(phone='(123)456-7890')
+        contacts.close()  # Flushes what is left
+        self.assertEqual(self._disk_phones(), ['(123)555-0000'])
+
+    def test_lookups_do_not_wait_for_a_flush_writing_the_file(self):
+        contacts = InMemoryContacts(self.db_name, write_mode='async', flush_interval=60)
+        contacts.add(first_name='Jane', last_name='Doe', phone='(123)555-0000')
+        blocker = sqlite3.connect(self.db_name, isolation_level=None, check_same_thread=False)
+        blocker.execute("BEGIN IMMEDIATE")  # The flush now waits for the file's write lock
+        flusher = threading.Thread(target=contacts.flush)
+        flusher.start()
+        try:
+            time.sleep(0.1)
+            started = time.monotonic()
+            self.assertEqual(contacts.find_by_phone('(123)555-0000')['first_name'], 'Jane')
+            self.assertLess(time.monotonic() - started, 0.5)
+        finally:
+            blocker.execute("COMMIT")
+            flusher.join()
+            blocker.close()
+        self.assertEqual(contacts.flushes, 1)
+        self.assertEqual(self._disk_phones(), ['(123)456-7890', '(123)555-0000'])
+        contacts.close()
+
+    def test_concurrent_readers_and_writer_share_the_copy(self):
+        contacts = InMemoryContacts(self.db_name, write_mode='async', flush_interval=60)
+        errors = []
+        misses = []
+        done = threading.Event()
+
+        def read():
+            try:
+                while not done.is_set():
+                    if contacts.find_by_phone('(123)456-7890') is None:
+                        misses.append(1)
+                    contacts.count_contacts()
+            except Exception as e:
+                errors.append(e)
+
+        readers = [threading.Thread(target=read) for _ in range(3)]
+        for reader in readers:
+            reader.start()
+        try:
+            for i in range(100):
+                contacts.add(first_name='Jane', last_name='Doe', phone=f'(555)000-{i:04d}')
+        except Exception as e:
+            errors.append(e)
+        finally:
+            done.set()
+            for reader in readers:
+                reader.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(misses, [])
+        self.assertEqual(contacts.count_contacts(), 101)
+        contacts.close()
+        self.assertEqual(len(self._disk_phones()), 101)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,20 @@
+import unittest
+
+from data.migrations import MIGRATIONS, migrate, schema_version
+from tests.base import TempDatabaseTestCase
+
+
+class TestMigrations(TempDatabaseTestCase):
+
+    def test_new_database_is_at_latest_version_with_indexes(self):
+        self.assertEqual(schema_version(self.contacts), MIGRATIONS[-1][0])
+        indexes = {row['name'] for row in self.contacts.fetchall("PRAGMA index_list(contacts)")}
+        self.assertTrue({'idx_contacts_last_name', 'idx_contacts_first_name', 'idx_contacts_email',
+                         'idx_contacts_created_at', 'idx_contacts_updated_at'} <= indexes)
+
+    def test_migrate_is_idempotent(self):
+        self.assertEqual(migrate(self.contacts), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
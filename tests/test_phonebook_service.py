@@ -1,14 +1,17 @@
 import unittest
 from unittest.mock import MagicMock, mock_open, patch
 from app.services.phonebook_service import PhoneBookService
+from tests.base import TempDatabaseTestCase
 
 
-class TestPhoneBookService(unittest.TestCase):
+class TestPhoneBookService(TempDatabaseTestCase):
 
     def setUp(self):
+        super().setUp()
+        self.real_contacts = self.contacts
         # Mocking the Contacts model
         self.contacts = MagicMock()
-        self.service = PhoneBookService()
+        self.service = PhoneBookService(self.real_contacts)
         self.service.contacts = self.contacts  # Injecting the mocked Contacts into the service
 
     @patch('builtins.open', new_callable=mock_open,
@@ -17,6 +20,7 @@ class TestPhoneBookService(unittest.TestCase):
     def test_bulk_add_contacts_from_csv(self, mock_logger, mock_file):
         # Mocking the find_by_phone to return None, so it doesn't detect duplicates
         self.contacts.find_by_phone.return_value = None
+        self.contacts.bulk_add.return_value = {'inserted': 2, 'errors': []}
 
         # Simulate the bulk add method
         self.service.bulk_add_contacts_from_csv('tests/test_data/contacts.csv')
@@ -28,7 +32,7 @@ class TestPhoneBookService(unittest.TestCase):
             {'first_name': 'Jane', 'last_name': 'Smith', 'phone': '(987)654-3210', 'email': 'jane@example.com',
              'address': '456 Oak St'}
         ]
-        self.contacts.bulk_add.assert_called_once_with(expected_records)
+        self.contacts.bulk_add.assert_called_once_with(expected_records, partial=True)
 
     @patch('builtins.open', new_callable=mock_open,
            read_data='first_name,last_name,phone\nJohn,Doe,2234567890\nJane,Smith,9876543220')
@@ -36,6 +40,7 @@ class TestPhoneBookService(unittest.TestCase):
     def test_bulk_add_contacts_from_csv_missing_fields(self, mock_logger, mock_file):
         # Mocking the find_by_phone to return None, so it doesn't detect duplicates
         self.contacts.find_by_phone.return_value = None
+        self.contacts.bulk_add.return_value = {'inserted': 2, 'errors': []}
 
         # Simulate the bulk add method
         self.service.bulk_add_contacts_from_csv('tests/test_data/contacts.csv')
@@ -47,8 +52,65 @@ class TestPhoneBookService(unittest.TestCase):
         ]
 
         # Assert that the bulk_add method was called with the correctly formatted records
-        self.contacts.bulk_add.assert_called_once_with(expected_records)
+        self.contacts.bulk_add.assert_called_once_with(expected_records, partial=True)
 
+    @patch('builtins.open', new_callable=mock_open,
+           read_data='first_name,last_name,phone,email\nJohn,Doe,2234567890,not-an-email\nJane,Sm1th,9876543220,x')
+    @patch('app.services.phonebook_service.app_logger')  # Mocking logger
+    def test_bulk_add_contacts_from_csv_drops_an_invalid_email(self, mock_logger, mock_file):
+        self.contacts.find_by_phone.return_value = None
+        self.contacts.bulk_add.return_value = {'inserted': 1, 'errors': []}
+
+        summary = self.service.bulk_add_contacts_from_csv('tests/test_data/contacts.csv')
+
+        # The row is imported without its email; a row with another invalid field is still rejected
+        self.contacts.bulk_add.assert_called_once_with(
+            [{'first_name': 'John', 'last_name': 'Doe', 'phone': '(223)456-7890', 'email': None, 'address': None}],
+            partial=True)
+        self.assertEqual(summary['failed_count'], 1)
+        self.assertEqual(summary['failed_records'][0]['record']['first_name'], 'Jane')
+
+    @patch('builtins.open', new_callable=mock_open,
+           read_data='first_name,last_name,phone\nJohn,Doe,2234567890\nJane,Smith,9876543220')
+    @patch('app.services.phonebook_service.app_logger')  # Mocking logger
+    def test_bulk_add_contacts_from_csv_reports_rejected_rows(self, mock_logger, mock_file):
+        self.contacts.find_by_phone.return_value = None
+        self.contacts.bulk_add.return_value = {
+            'inserted': 1, 'errors': [{'index': 1, 'record': {}, 'error': 'UNIQUE constraint failed: contacts.phone'}]}
+
+        summary = self.service.bulk_add_contacts_from_csv('tests/test_data/contacts.csv')
+
+        self.assertEqual(summary['success_count'], 1)
+        self.assertEqual(summary['failed_count'], 1)
+        self.assertEqual(summary['failed_records'][0]['record']['first_name'], 'Jane')
+
+    @patch('builtins.open', new_callable=mock_open,
+           read_data='first_name,last_name,phone\nJohn,Doe,2234567890\nJane,Smith,9876543220')
+    @patch('app.services.phonebook_service.app_logger')  # Mocking logger
+    def test_bulk_add_contacts_from_csv_failed_batch_reports_every_row(self, mock_logger, mock_file):
+        self.contacts.find_by_phone.return_value = None
+        self.contacts.bulk_add.side_effect = Exception("database is locked")
+
+        summary = self.service.bulk_add_contacts_from_csv('tests/test_data/contacts.csv')
+
+        self.assertEqual(summary['success_count'], 0)
+        self.assertEqual(summary['failed_count'], 2)
+
+    def test_idle_maintenance_bounds_the_change_log(self):
+        self.real_contacts.bulk_add([
+            {'first_name': 'Name', 'last_name': 'Test', 'phone': f'(555)000-{i:04d}'} for i in range(25)
+        ])
+        self.service.change_log_rows = 5
+        self.service.run_idle_maintenance()
+
+        self.assertEqual(self.real_contacts.change_log.size(), 5)
+
+    def test_close_releases_the_maintenance_handles(self):
+        self.service.display_maintenance_report()  # Opens the maintenance connection
+        self.service.close()
+
+        self.assertIsNone(self.service.maintenance[0].conn)
+        self.contacts.close.assert_called_once()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,71 @@
+import unittest
+
+from tests.base import TempDatabaseTestCase
+
+
+class TestQueryBuilder(TempDatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.contacts.bulk_add([
+            {'first_name': 'John', 'last_name': 'Doe', 'phone': '(123)456-7890', 'email': 'john@example.com'},
+            {'first_name': 'Jane', 'last_name': 'Smith', 'phone': '(987)654-3210', 'email': None},
+            {'first_name': 'Jake', 'last_name': 'Smithers', 'phone': '(112)233-4455', 'email': None},
+            {'first_name': 'Alice', 'last_name': 'Johnson', 'phone': '(223)344-5566', 'email': 'alice@example.com'},
+        ])
+        self.contacts.execute("UPDATE contacts SET created_at = '2024-08-15 10:00:00' WHERE id = 1")
+        self.contacts.execute("UPDATE contacts SET created_at = '2024-09-02 10:00:00' WHERE id IN (2, 3)")
+        self.contacts.execute("UPDATE contacts SET created_at = '2024-10-01 00:00:00' WHERE id = 4")
+        self.contacts.commit()
+
+    def test_operators_and_projection(self):
+        rows = self.contacts.fetch_all(filters=[('last_name', 'prefix', 'Smith')], columns=['id', 'phone'])
+        self.assertEqual(rows, [{'id': 2, 'phone': '(987)654-3210'}, {'id': 3, 'phone': '(112)233-4455'}])
+
+        september = self.contacts.fetch_all(filters=[('created_at', 'range', ('2024-09-01', '2024-10-01'))])
+        self.assertEqual([row['id'] for row in september], [2, 3])
+
+        self.assertEqual([row['id'] for row in self.contacts.fetch_all(filters=[('id', 'in', [4, 1])])], [1, 4])
+        self.assertEqual(self.contacts.fetch_all(filters=[('id', 'in', [])]), [])
+        self.assertEqual([row['id'] for row in self.contacts.fetch_all(filters=[('email', 'is_null', False)])],
+                         [1, 4])
+        self.assertEqual([row['id'] for row in self.contacts.fetch_all(
+            filters=[('email', 'is_null', True)], last_name='Smith')], [2])
+
+    def test_order_by_indexed_columns_only(self):
+        rows = self.contacts.fetch_all(order_by='-created_at', columns=['id'])
+        self.assertEqual([row['id'] for row in rows], [4, 3, 2, 1])
+        rows = self.contacts.fetch_all(order_by=['last_name'], limit=2, offset=1)
+        self.assertEqual([row['last_name'] for row in rows], ['Johnson', 'Smith'])
+        with self.assertRaises(ValueError):
+            self.contacts.fetch_all(order_by='address')
+        with self.assertRaises(ValueError):
+            self.contacts.fetch_all(columns=['id; DROP TABLE contacts'])
+
+    def test_iter_all_streams_every_row(self):
+        rows = list(self.contacts.iter_all(columns=['phone'], batch_size=3))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0], {'phone': '(123)456-7890'})
+
+    def test_writes_while_streaming_fail_fast_and_reads_still_work(self):
+        stream = self.contacts.iter_all(columns=['id'], batch_size=2)
+        first = next(stream)
+        with self.assertRaises(RuntimeError):
+            self.contacts.update({'id': first['id']}, address='1 Main St')
+        self.contacts.fetch_one(id=first['id'])  # Reads on the shared connection do not disturb the stream
+        self.assertEqual(len([first] + list(stream)), 4)
+
+        ids = [row['id'] for row in self.contacts.iter_all(columns=['id'])]
+        for contact_id in ids:  # Stream closed: writing is fine again
+            self.contacts.update({'id': contact_id}, address='1 Main St')
+
+    def test_sql_text_is_reused_for_the_same_shape(self):
+        builder = self.contacts.query_builder()
+        first, first_params = builder.build([('last_name', 'prefix', 'Do')], limit=10)
+        second, second_params = builder.build([('last_name', 'prefix', 'Smi')], limit=10)
+        self.assertIs(first, second)
+        self.assertNotEqual(first_params, second_params)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+
+from app.models.sharded_contacts import ShardedContacts
+from tests.base import TempDatabaseTestCase
+
+
+class TestShardedContacts(TempDatabaseTestCase):
+    with_contacts = False
+
+    def setUp(self):
+        super().setUp()
+        self.contacts = ShardedContacts(self.db_name, shards=3)
+        self.addCleanup(self.contacts.close)
+        self.records = [
+            {'first_name': f'Name{i}', 'last_name': 'Test', 'phone': f'({i:03d})555-{i:04d}',
+             'email': None, 'address': None}
+            for i in range(30)
+        ]
+        self.contacts.bulk_add(self.records)
+
+    def test_bulk_add_spreads_rows_over_shard_files(self):
+        self.assertEqual(self.contacts.count_contacts(), 30)
+        per_shard = self.contacts.count_per_shard()
+        self.assertEqual(sum(per_shard), 30)
+        self.assertTrue(all(count > 0 for count in per_shard))
+
+    def test_point_lookup_and_global_ids(self):
+        contact = self.contacts.find_by_phone('(007)555-0007')
+        self.assertEqual(contact['first_name'], 'Name7')
+        self.assertEqual(self.contacts.fetch_one(id=contact['id'])['phone'], '(007)555-0007')
+
+        self.contacts.update_contact_by_id(contact['id'], first_name='Changed')
+        self.assertEqual(self.contacts.find_by_phone('(007)555-0007')['first_name'], 'Changed')
+
+        self.contacts.delete(id=contact['id'])
+        self.assertIsNone(self.contacts.find_by_phone('(007)555-0007'))
+        self.assertEqual(self.contacts.count_contacts(), 29)
+
+    def test_scatter_gather_pagination_is_ordered(self):
+        first_page = self.contacts.get_all_contacts(limit=10, offset=0)
+        second_page = self.contacts.get_all_contacts(limit=10, offset=10)
+        ids = [row['id'] for row in first_page + second_page]
+        self.assertEqual(len(ids), 20)
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), 20)
+
+        self.assertEqual(self.contacts.count_contacts('Name1'), 11)  # Name1 and Name10..Name19
+        found = self.contacts.search_contact('Name1', limit=5, offset=5)
+        self.assertEqual(len(found), 5)
+
+    def test_filters_projection_and_order_merge_across_shards(self):
+        rows = self.contacts.fetch_all(limit=5, offset=2, columns=['phone'], order_by='-first_name',
+                                       filters=[('first_name', 'prefix', 'Name2')])
+        # Name2, Name20..Name29 sorted descending: Name29, Name28, [Name27, Name26, Name25, Name24, Name23]
+        self.assertEqual(rows, [{'phone': f'({i:03d})555-{i:04d}'} for i in range(27, 22, -1)])
+
+    def test_id_filters_use_global_ids(self):
+        ids = sorted(row['id'] for row in self.contacts.fetch_all(limit=100, columns=['id']))
+        picked = ids[3:6]
+
+        rows = self.contacts.fetch_all(limit=100, filters=[('id', 'in', picked)])
+        self.assertEqual([row['id'] for row in rows], picked)
+        self.assertEqual(self.contacts.fetch_all(filters=[('id', 'eq', picked[0])]),
+                         [self.contacts.fetch_one(id=picked[0])])
+        rows = self.contacts.fetch_all(limit=100, columns=['id'], filters=[('id', 'range', (ids[5], ids[20]))])
+        self.assertEqual([row['id'] for row in rows], ids[5:20])
+        with self.assertRaises(ValueError):
+            self.contacts.fetch_all(filters=[('id', 'prefix', '1')])
+
+    def test_phone_change_moves_contact_between_shards(self):
+        old_phone = '(001)555-0001'
+        new_phone = next(f'(999)555-{i:04d}' for i in range(100)
+                         if self.contacts.shard_for_phone(f'(999)555-{i:04d}')
+                         != self.contacts.shard_for_phone(old_phone))
+        self.contacts.update({'phone': old_phone}, phone=new_phone)
+        self.assertIsNone(self.contacts.find_by_phone(old_phone))
+        self.assertEqual(self.contacts.find_by_phone(new_phone)['first_name'], 'Name1')
+        self.assertEqual(self.contacts.count_contacts(), 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
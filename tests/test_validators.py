@@ -0,0 +1,38 @@
+import unittest
+
+from tests.base import TempDatabaseTestCase
+
+
+class TestRecordValidator(TempDatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.validator = self.contacts.validator
+
+    def test_validate_normalizes_fields(self):
+        record, errors = self.validator.validate({
+            'first_name': ' John ', 'last_name': 'Doe', 'phone': '1234567890', 'email': '', 'address': ' '})
+        self.assertEqual(errors, {})
+        self.assertEqual(record, {'first_name': 'John', 'last_name': 'Doe', 'phone': '(123)456-7890',
+                                  'email': None, 'address': None})
+
+    def test_validate_batch_returns_error_vector(self):
+        records, errors = self.validator.validate_batch([
+            {'first_name': 'John', 'last_name': 'Doe', 'phone': '(123)456-7890'},
+            {'first_name': 'J0hn', 'last_name': 'Doe', 'phone': '12345', 'email': 'not-an-email'},
+            {'first_name': 'Jane', 'phone': '9876543210', 'nickname': 'JJ'},
+        ])
+        self.assertEqual(len(records), 3)
+        self.assertEqual(errors[0], {})
+        self.assertEqual(set(errors[1]), {'first_name', 'phone', 'email'})
+        self.assertEqual(set(errors[2]), {'nickname', 'last_name'})
+
+    def test_partial_validation_skips_missing_required_fields(self):
+        record, errors = self.validator.validate({'email': 'john@example.com'}, partial=True)
+        self.assertEqual(errors, {})
+        self.assertEqual(self.validator.validate({'first_name': None}, partial=True)[1],
+                         {'first_name': 'first_name is required'})
+
+
+if __name__ == '__main__':
+    unittest.main()
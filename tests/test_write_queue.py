@@ -0,0 +1,63 @@
+import sqlite3
+import unittest
+
+from app.models.contact import Contacts
+from data.write_queue import GroupCommitWriter
+from tests.base import TempDatabaseTestCase
+
+
+class TestGroupCommitWriter(TempDatabaseTestCase):
+
+    def test_writes_are_coalesced_into_few_commits(self):
+        writer = GroupCommitWriter(self.db_name, max_batch=100, max_delay=0.05)
+        futures = [writer.add(first_name='Name', last_name='Test', phone=f'(555)000-{i:04d}') for i in range(300)]
+        ids = [future.result() for future in futures]
+        writer.close()
+
+        self.assertEqual(len(set(ids)), 300)
+        self.assertEqual(self.contacts.count_contacts(), 300)
+        self.assertLess(writer.batches, 300)
+        self.assertEqual(writer.operations, 300)
+
+    def test_failing_operation_only_fails_its_own_future(self):
+        writer = GroupCommitWriter(self.db_name, max_delay=0.05, durability='normal')
+        first = writer.add(first_name='John', last_name='Doe', phone='(123)456-7890')
+        duplicate = writer.add(first_name='Jane', last_name='Doe', phone='(123)456-7890')
+        update = writer.update({'phone': '(123)456-7890'}, email='john@example.com')
+        delete_missing = writer.delete(phone='(000)000-0000')
+        writer.close()
+
+        self.assertIsInstance(first.result(), int)
+        with self.assertRaises(sqlite3.IntegrityError):
+            duplicate.result()
+        self.assertEqual(update.result(), 1)
+        self.assertEqual(delete_missing.result(), 0)
+        self.assertEqual(self.contacts.find_by_phone('(123)456-7890')['email'], 'john@example.com')
+
+    def test_full_durability_switches_a_wal_file_back_to_the_rollback_journal(self):
+        GroupCommitWriter(self.db_name, durability='normal').close()
+        GroupCommitWriter(self.db_name, durability='full').close()
+
+        conn = sqlite3.connect(self.db_name)
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], 'delete')
+        conn.close()
+
+    def test_full_durability_fails_clearly_while_another_connection_holds_a_wal_file(self):
+        GroupCommitWriter(self.db_name, durability='normal').close()
+        contacts = Contacts(self.db_name)  # Opens the file while it is in WAL
+        try:
+            with self.assertRaises(RuntimeError) as context:
+                GroupCommitWriter(self.db_name, durability='full')
+        finally:
+            contacts.close()
+        self.assertIn("another connection", str(context.exception))
+
+        self.contacts.close()
+        GroupCommitWriter(self.db_name, durability='full').close()  # Alone with the file: the switch works
+        conn = sqlite3.connect(self.db_name)
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], 'delete')
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,12 +6,14 @@ import logging
 
 
 def setup_logger(name, log_file, level=logging.INFO):
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+    if logger.handlers:
+        return logger  # Already set up by another module; a second handler would write every line twice
+
     formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
     handler = logging.FileHandler(log_file)
     handler.setFormatter(formatter)
-
-    logger = logging.getLogger(name)
-    logger.setLevel(level)
     logger.addHandler(handler)
 
     return logger
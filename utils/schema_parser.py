@@ -9,3 +9,8 @@ def get_table_schema(db, table_name):
     columns = db.fetchall(query)
     schema = {col['name']: col['type'] for col in columns}
     return schema
+
+
+def get_table_columns(db, table_name):
+    """Full column descriptions (name, type, notnull, dflt_value, pk) from PRAGMA table_info."""
+    return db.fetchall(f"PRAGMA table_info({table_name})")
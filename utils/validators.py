@@ -2,8 +2,124 @@
 @Time ： 2024-09-16
 @Auth ： Adam Lyu
 """
+import re
+
+# Python types expected for the declared SQLite column types
+SQL_TYPES = {'INTEGER': int, 'TEXT': str, 'REAL': float, 'TIMESTAMP': str}
+
+_compiled_validators = {}
+
+
 def validate_fields(fields, schema):
     for field, value in fields.items():
         if field not in schema:
             raise ValueError(f"Field {field} is not in schema")
         # Example: You can add more specific validation based on the schema type if needed
+
+
+def format_phone(phone):
+    """Format (xxx)xxx-xxxx or xxxxxxxxxx as (xxx)xxx-xxxx; anything else is returned stripped, unchanged."""
+    phone = str(phone).strip()
+    if re.match(r'^\(\d{3}\)\d{3}-\d{4}$', phone):
+        return phone
+    if re.match(r'^\d{10}$', phone):
+        return f"({phone[:3]}){phone[3:6]}-{phone[6:]}"
+    return phone
+
+
+def strip_or_none(value):
+    """Strip a text value and turn empty strings into None."""
+    value = str(value).strip()
+    return value or None
+
+
+class RecordValidator:
+    """
+    Validator compiled once from a table's columns (PRAGMA table_info rows) and a rule spec.
+
+    A rule spec maps a column name to any of: 'type' (Python type, defaults to the SQL declared type),
+    'nullable' (defaults to the column's NOT NULL constraint), 'regex', 'normalizer' (applied before the
+    checks) and 'message' (error text, may use {value}). Every column gets one closure with its regex
+    pre-compiled, so validating a record is just a dictionary walk.
+    """
+
+    def __init__(self, columns, rules):
+        self.checks = {}
+        self.required = []
+        for column in columns:
+            name = column['name']
+            rule = rules.get(name, {})
+            nullable = rule.get('nullable', not column['notnull'] or bool(column['pk']))
+            if not nullable and column['dflt_value'] is None:
+                self.required.append(name)
+            self.checks[name] = self._compile(name, column['type'], nullable, rule)
+
+    @staticmethod
+    def _compile(name, sql_type, nullable, rule):
+        expected = rule.get('type', SQL_TYPES.get((sql_type or '').upper()))
+        pattern = re.compile(rule['regex']) if rule.get('regex') else None
+        normalizer = rule.get('normalizer')
+        message = rule.get('message', f"Invalid {name}: {{value}}")
+
+        def check(value):
+            if normalizer is not None and value is not None:
+                try:
+                    value = normalizer(value)
+                except (TypeError, ValueError, AttributeError):
+                    return value, message.format(value=value)
+            if value is None:
+                return None, None if nullable else f"{name} is required"
+            if expected is not None and not isinstance(value, expected):
+                return value, f"{name} must be of type {expected.__name__}"
+            if pattern is not None and not pattern.match(value):
+                return value, message.format(value=value)
+            return value, None
+
+        return check
+
+    def validate_field(self, field, value):
+        """Validate and normalize one value; returns (normalized value, error message or None)."""
+        check = self.checks.get(field)
+        if check is None:
+            return value, f"Field {field} is not in schema"
+        return check(value)
+
+    def validate(self, record, partial=False):
+        """
+        Validate and normalize one record; returns (normalized record, {field: error}).
+        With `partial=True` (updates) missing required fields are not reported.
+        """
+        clean = {}
+        errors = {}
+        for field, value in record.items():
+            clean[field], error = self.validate_field(field, value)
+            if error:
+                errors[field] = error
+        if not partial:
+            for field in self.required:
+                if field not in record:
+                    errors[field] = f"{field} is required"
+        return clean, errors
+
+    def validate_batch(self, records, partial=False):
+        """
+        Validate many records in one call.
+        Returns (normalized records, error vector) where errors[i] is the {field: error} dictionary of records[i],
+        empty when the record is valid.
+        """
+        clean_records = []
+        errors = []
+        validate = self.validate
+        for record in records:
+            clean, record_errors = validate(record, partial)
+            clean_records.append(clean)
+            errors.append(record_errors)
+        return clean_records, errors
+
+
+def compile_validator(columns, rules):
+    """Return the `RecordValidator` for these columns and rules, compiling it only the first time."""
+    key = (tuple((c['name'], c['type'], c['notnull'], c['dflt_value'], c['pk']) for c in columns), id(rules))
+    if key not in _compiled_validators:
+        _compiled_validators[key] = RecordValidator(columns, rules)
+    return _compiled_validators[key]